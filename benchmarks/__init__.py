@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for the PractiTest connector.
+
+Every benchmark is a module runnable from the repository root, e.g.:
+    python -m benchmarks.bench_enrichment
+"""
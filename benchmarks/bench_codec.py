@@ -0,0 +1,99 @@
+"""
+Compares the standard library JSON handling used before the codec layer with connector.static.core.codec on
+realistic PractiTest instance pages of 100 items and on the test messages of a dispatch: parsing the pages from
+the response, serializing every message and writing the JSON dispatch file.
+
+    python -m benchmarks.bench_codec --pages 50 --repeat 5
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import requests
+
+from benchmarks.common import setup_django, timed
+from benchmarks.bench_sqs_pusher import make_messages
+
+
+def make_page(page, page_count):
+    """
+    Builds a PractiTest instances page response, see synthetic.make_instance_page.
+    """
+    from benchmarks import synthetic
+
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    response._content = json.dumps(synthetic.make_instance_page(page, page_count)).encode('utf-8')
+    return response
+
+
+def best_of(repeat, func, *args):
+    return min(timed(func, *args)[1] for _ in range(repeat))
+
+
+def parse_stdlib(responses):
+    for response in responses:
+        json.loads(response.text)
+
+
+def parse_codec(responses):
+    from connector.static.core import codec
+
+    for response in responses:
+        codec.loads(response.content)
+
+
+def write_stdlib(messages, path):
+    with open(path, 'w') as f:
+        json.dump(messages, f, indent=2)
+
+
+def run(page_count, message_count, repeat):
+    from benchmarks.synthetic import PAGE_SIZE
+    from connector.static.core import codec, static_methods
+
+    responses = [make_page(page, page_count) for page in range(1, page_count + 1)]
+    messages = make_messages(message_count, 0)
+    page_bytes = sum(len(response.content) for response in responses)
+
+    results = {'backend': codec.BACKEND}
+    parse_before, parse_after = best_of(repeat, parse_stdlib, responses), best_of(repeat, parse_codec, responses)
+    dumps_before = best_of(repeat, lambda: [json.dumps(message) for message in messages])
+    dumps_after = best_of(repeat, lambda: [codec.dumps(message) for message in messages])
+    payload_before = sum(len(json.dumps(message).encode('utf-8')) for message in messages)
+    payload_after = sum(len(codec.dumps(message).encode('utf-8')) for message in messages)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'to_execute.json')
+        write_before = best_of(repeat, write_stdlib, messages, path)
+        file_before = os.path.getsize(path)
+        write_after = best_of(repeat, static_methods.write_dict_to_json_file, messages, path)
+        file_after = os.path.getsize(path)
+
+    print(f'codec backend: {codec.BACKEND}')
+    print(f'parse {page_count} pages of {PAGE_SIZE} instances ({page_bytes / 1024:.0f} KiB): '
+          f'{parse_before * 1000:.1f}ms -> {parse_after * 1000:.1f}ms ({parse_before / parse_after:.1f}x)')
+    print(f'serialize {len(messages)} messages: {dumps_before * 1000:.1f}ms -> {dumps_after * 1000:.1f}ms '
+          f'({dumps_before / dumps_after:.1f}x), payload {payload_before / 1024:.0f} KiB -> {payload_after / 1024:.0f} KiB')
+    print(f'write dispatch file: {write_before * 1000:.1f}ms -> {write_after * 1000:.1f}ms '
+          f'({write_before / write_after:.1f}x), {file_before / 1024:.0f} KiB -> {file_after / 1024:.0f} KiB')
+    results.update(parse_seconds=(parse_before, parse_after), dumps_seconds=(dumps_before, dumps_after),
+                   payload_bytes=(payload_before, payload_after), write_seconds=(write_before, write_after),
+                   file_bytes=(file_before, file_after))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=50, help='Instance pages of 100 items')
+    parser.add_argument('--messages', type=int, default=2000, help='Test messages of the dispatch')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of each measure, the best one is reported')
+    args = parser.parse_args()
+    setup_django()
+    run(args.pages, args.messages, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
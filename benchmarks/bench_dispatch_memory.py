@@ -0,0 +1,107 @@
+"""
+Compares the peak memory of a cycle dispatching the tests of a large filter, with the previous per-test
+dictionaries (the raw test instances kept for the whole cycle) and with DispatchRecords (every page released
+once projected). Each variant runs in its own process, and reports its peak RSS growth (ru_maxrss) while
+fetching, projecting and dispatching the tests to a JSONL file.
+
+    python -m benchmarks.bench_dispatch_memory --instances 20000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import peak_rss_bytes, setup_django
+
+VARIANTS = ('dicts', 'records')
+
+
+def dispatch_dicts(practitest, test_sets):
+    """
+    The previous projection: every matching raw test instance is kept, and a dictionary is built for each test.
+    """
+    filter_test_sets_dict = practitest.convert_test_set_obj_list_to_dict_set_id_as_key(test_sets)
+    pages = practitest.get_list_of_instance_pages(list(filter_test_sets_dict.keys()))
+    tests = [test for page_data in pages
+             for test in practitest.get_page_tests_by_status(page_data, filter_test_sets_dict)]
+    del pages
+    field_plan = practitest.get_field_plan()
+    tests_by_instance_id = {}
+    for test in tests:
+        test_set = filter_test_sets_dict[str(test['attributes']['set-id'])]
+        test_attributes = test['attributes']
+        test_dict = {
+            'project_name': practitest.PROJECT_NAME,
+            'test_id': str(test_attributes['test-display-id']),
+            'test_instance': str(test['id']),
+            'test_name': str(test_attributes['name']).replace("'", '').replace('(', '').replace(')', ''),
+            'test_set_id': str(test_set['attributes']['display-id']),
+            'test_set_name': str(test_set['attributes']['name']),
+            'project_pt_id': str(test_attributes['project-id']),
+            'execution_session_id': str(time.time()).replace('.', ''),
+        }
+        test_dict.update(zip(field_plan.keys, field_plan.resolve_values(test, test_set)))
+        tests_by_instance_id[test_dict['test_instance']] = test_dict
+    return list(tests_by_instance_id.values()), tests
+
+
+def run_variant(variant, instance_count):
+    from benchmarks import synthetic
+    from connector.static.core import codec
+    from connector.static.core.dispatch_sinks import JsonlFileSink
+    from connector.static.core.kms.kms_practitest import KmsPractiTest
+
+    page_count = max(1, instance_count // synthetic.PAGE_SIZE)
+    test_sets = [synthetic.make_test_set(set_id) for set_id in range(1, page_count + 1)]
+    # The PractiTest responses, parsed when fetched as they are from the network
+    responses = [codec.dumps_bytes(synthetic.make_instance_page(page, page_count)) for page in range(1, page_count + 1)]
+    practitest = KmsPractiTest(synthetic.load_optional_data(), **synthetic.load_initial_data())
+    practitest.get_instances_page = lambda url, page: codec.loads(responses[page - 1])
+    practitest.get_field_plan()
+
+    with tempfile.TemporaryDirectory() as directory:
+        sink = JsonlFileSink(os.path.join(directory, 'to_execute.jsonl'))
+        baseline = peak_rss_bytes()
+        start = time.perf_counter()
+        if variant == 'dicts':
+            tests_to_execute, tests = dispatch_dicts(practitest, test_sets)
+        else:
+            tests_to_execute = practitest.get_dict_of_tests_objects(test_sets)
+        result = sink.send(tests_to_execute)
+        elapsed = time.perf_counter() - start
+        peak_growth = peak_rss_bytes() - baseline
+    return {'variant': variant, 'instances': page_count * synthetic.PAGE_SIZE, 'dispatched': result.sent,
+            'seconds': round(elapsed, 3), 'peak_rss_growth_mib': round(peak_growth / 2 ** 20, 1)}
+
+
+def run(instance_count):
+    results = {}
+    for variant in VARIANTS:
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_dispatch_memory', '--instances',
+                                 str(instance_count), '--variant', variant], check=True, capture_output=True, text=True)
+        results[variant] = json.loads(output.stdout.strip().splitlines()[-1])
+    before, after = results['dicts'], results['records']
+    print(f"{before['instances']} instances, {before['dispatched']} dispatched: peak RSS growth "
+          f"{before['peak_rss_growth_mib']} MiB with dictionaries ({before['seconds']}s), "
+          f"{after['peak_rss_growth_mib']} MiB with records ({after['seconds']}s)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--instances', type=int, default=20000)
+    parser.add_argument('--variant', choices=VARIANTS,
+                        help='Run a single variant in this process and print its JSON result')
+    args = parser.parse_args()
+    if args.variant:
+        setup_django()
+        print(json.dumps(run_variant(args.variant, args.instances)))
+    else:
+        run(args.instances)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Measures the throughput (messages/sec) and the latency of a dispatch (the time until the sink accepted all the
+tests of a cycle) of every dispatch sink, against local stand-ins: a temporary directory for the file sinks,
+an in-process queue, a local HTTP endpoint and a local SQS client with a simulated round trip.
+
+    python -m benchmarks.bench_dispatch_sinks --messages 20000 --dispatch-size 200 --sqs-latency 0.02
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import setup_django
+from benchmarks.local_endpoint import LocalEndpoint
+from benchmarks.local_sqs import LocalSQSClient
+
+QUEUE_URL = 'https://sqs.local/000000000000/automation-hub'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(sink, messages, dispatch_size):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(messages), dispatch_size):
+        dispatch_start = time.perf_counter()
+        result = sink.send(messages[i:i + dispatch_size])
+        latencies.append(time.perf_counter() - dispatch_start)
+        if result.failed:
+            raise AssertionError(f'{sink.describe()} rejected {result.failed} messages')
+    elapsed = time.perf_counter() - start
+    sink.close()
+    return {
+        'messages_per_second': round(len(messages) / elapsed),
+        'dispatch_p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'dispatch_p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'dispatch_max_ms': round(max(latencies) * 1000, 2),
+    }
+
+
+def run(message_count, dispatch_size, sqs_latency):
+    from benchmarks.bench_sqs_pusher import make_messages
+    from connector.static.core import codec
+    from connector.static.core.dispatch_sinks import (HttpSink, InProcessQueueSink, JsonFileSink, JsonlFileSink,
+                                                      SQSSink, get_local_queue)
+
+    messages = make_messages(message_count, 0)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, LocalEndpoint() as endpoint:
+        sqs_client = LocalSQSClient(latency=sqs_latency)
+        sinks = {
+            'json': JsonFileSink(directory),
+            'jsonl': JsonlFileSink(os.path.join(directory, 'to_execute.jsonl')),
+            'queue': InProcessQueueSink('bench_dispatch_sinks'),
+            'http': HttpSink(endpoint.url),
+            'sqs': SQSSink(QUEUE_URL, client=sqs_client),
+        }
+        for name, sink in sinks.items():
+            results[name] = measure(sink, messages, dispatch_size)
+
+        delivered = {
+            'json': len(codec.load_file(sinks['json'].last_filename)),
+            'jsonl': sum(1 for _ in open(os.path.join(directory, 'to_execute.jsonl'))),
+            'queue': get_local_queue('bench_dispatch_sinks').qsize(),
+            'http': endpoint.received,
+            'sqs': len(sqs_client.queues[QUEUE_URL]),
+        }
+        for name, count in delivered.items():
+            if count != len(messages):
+                raise AssertionError(f'{name}: {count} of {len(messages)} messages delivered')
+
+    print(f'{len(messages)} messages in dispatches of {dispatch_size}:')
+    for name, result in results.items():
+        print(f"  {name:6} {result['messages_per_second']:>9} msg/s, dispatch p50 {result['dispatch_p50_ms']} ms, "
+              f"p95 {result['dispatch_p95_ms']} ms, max {result['dispatch_max_ms']} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--dispatch-size', type=int, default=200, help='Tests dispatched per cycle')
+    parser.add_argument('--sqs-latency', type=float, default=0.02, help='Seconds per SQS send_message_batch call')
+    args = parser.parse_args()
+    setup_django()
+    run(args.messages, args.dispatch_size, args.sqs_latency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Runs block cycles end to end, offline: KmsPractiTest.start_service fetches the trigger filters and the test
+instances from a local fake PractiTest server, dispatches the tests to a local SQS stand-in and marks the test
+sets as processed. Reports the cycle latency, the PractiTest API calls per cycle, the peak memory growth and the
+dispatched messages per second, and stores them as JSON to compare runs.
+
+    python -m benchmarks.bench_end_to_end --sets 40 --instances-per-set 250 --latency 0.02 --cycles 5
+    python -m benchmarks.bench_end_to_end --baseline benchmarks/results/end_to_end-20240101-120000.json
+"""
+import argparse
+import platform
+import statistics
+import sys
+import time
+
+from benchmarks.common import compare_results, peak_rss_bytes, save_results, setup_django, timed
+from benchmarks.fake_practitest import FakePractiTest
+from benchmarks.local_sqs import LocalSQSClient
+
+QUEUE_URL = 'https://sqs.local/000000000000/automation-hub'
+LOWER_IS_BETTER = {'cycle_p50_seconds', 'cycle_p95_seconds', 'cycle_max_seconds', 'api_calls_per_cycle',
+                   'peak_rss_growth_mib'}
+
+
+def run_cycle(server, client):
+    """
+    Runs one block cycle against the fake server.
+
+    :return: Tuple of (seconds, API calls, messages dispatched).
+    """
+    from benchmarks import synthetic
+    from connector.static.core.dispatch_sinks import SQSSink
+    from connector.static.core.kms.kms_practitest import KmsPractiTest
+    from connector.static.core.request_coalescer import get_shared_coalescer
+
+    server.reset()
+    get_shared_coalescer().invalidate()
+    delivered = len(client.queues.get(QUEUE_URL, ()))
+    initial_data = synthetic.load_initial_data(server.filter_id_list, practitest_api_url=server.api_url,
+                                               dispatch_sink=SQSSink.name, dispatch_target=QUEUE_URL)
+    practitest = KmsPractiTest(synthetic.load_optional_data(), **initial_data)
+    practitest.get_dispatch_sink = lambda: SQSSink(QUEUE_URL, client=client)
+    found, elapsed = timed(practitest.start_service)
+    if not found or len(server.processed) != server.set_count:
+        raise AssertionError(f'{len(server.processed)} of {server.set_count} test sets processed')
+    return elapsed, sum(server.calls.values()), len(client.queues[QUEUE_URL]) - delivered
+
+
+def run(set_count, instances_per_set, page_size, filters, latency, sqs_latency, cycles, warmup):
+    from connector.static.core import codec
+
+    client = LocalSQSClient(latency=sqs_latency)
+    with FakePractiTest(set_count, instances_per_set, page_size, filters, latency) as server:
+        for _ in range(warmup):
+            run_cycle(server, client)
+        baseline = peak_rss_bytes()
+        measures = [run_cycle(server, client) for _ in range(cycles)]
+
+    seconds = [measure[0] for measure in measures]
+    expected = set_count * instances_per_set
+    if any(measure[2] != expected for measure in measures):
+        raise AssertionError(f'Expected {expected} messages per cycle, got {[measure[2] for measure in measures]}')
+    metrics = {
+        'cycle_p50_seconds': round(statistics.median(seconds), 3),
+        'cycle_p95_seconds': round(sorted(seconds)[min(len(seconds) - 1, int(len(seconds) * 0.95))], 3),
+        'cycle_max_seconds': round(max(seconds), 3),
+        'api_calls_per_cycle': round(statistics.mean(measure[1] for measure in measures), 1),
+        'messages_per_cycle': expected,
+        'messages_per_second': round(sum(measure[2] for measure in measures) / sum(seconds)),
+        'peak_rss_growth_mib': round((peak_rss_bytes() - baseline) / 2 ** 20, 1),
+    }
+    results = {
+        'benchmark': 'end_to_end',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'codec': codec.BACKEND},
+        'config': {'sets': set_count, 'instances_per_set': instances_per_set, 'page_size': page_size,
+                   'filters': filters, 'latency': latency, 'sqs_latency': sqs_latency, 'cycles': cycles},
+        'metrics': metrics,
+    }
+    print(f'{cycles} cycles of {set_count} test sets x {instances_per_set} instances, pages of {page_size}, '
+          f'{filters} filters, {latency}s PractiTest latency:')
+    print(f"  cycle p50 {metrics['cycle_p50_seconds']}s, p95 {metrics['cycle_p95_seconds']}s, "
+          f"max {metrics['cycle_max_seconds']}s, {metrics['api_calls_per_cycle']} API calls per cycle")
+    print(f"  {metrics['messages_per_second']} messages/s, peak RSS growth {metrics['peak_rss_growth_mib']} MiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sets', type=int, default=40)
+    parser.add_argument('--instances-per-set', type=int, default=250)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--filters', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds of every PractiTest request')
+    parser.add_argument('--sqs-latency', type=float, default=0.005, help='Seconds of every SQS batch')
+    parser.add_argument('--cycles', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1, help='Cycles run before measuring')
+    parser.add_argument('--output', help='JSON file of the results, benchmarks/results/ by default')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change reported as a regression')
+    args = parser.parse_args()
+    setup_django()
+    results = run(args.sets, args.instances_per_set, args.page_size, args.filters, args.latency, args.sqs_latency,
+                  args.cycles, args.warmup)
+    print(f"results stored in {save_results('end_to_end', results, args.output)}")
+    if args.baseline:
+        print(f'compared with {args.baseline}:')
+        if compare_results(args.baseline, results, LOWER_IS_BETTER, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
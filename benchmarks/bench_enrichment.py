@@ -0,0 +1,45 @@
+"""
+Measures how the enrichment of test instances into dispatch records scales with the number of instances.
+
+The instances are served from memory, so only the CPU time of get_dict_of_tests_objects is measured.
+The time per instance should stay flat as the number of instances grows.
+
+    python -m benchmarks.bench_enrichment --sizes 1000,10000,50000
+"""
+import argparse
+
+from benchmarks.common import setup_django, timed
+
+
+def run(sizes, instances_per_set):
+    from connector.static.core.kms.kms_practitest import KmsPractiTest
+    from benchmarks import synthetic
+
+    results = []
+    for size in sizes:
+        set_count = max(1, size // instances_per_set)
+        test_sets, instances = synthetic.make_dataset(set_count, instances_per_set)
+        practitest = KmsPractiTest(synthetic.load_optional_data(), **synthetic.load_initial_data())
+        synthetic.serve_instances(practitest, instances)
+        tests, elapsed = timed(practitest.get_dict_of_tests_objects, test_sets)
+        results.append({
+            'instances': len(instances),
+            'dispatched': len(tests),
+            'seconds': round(elapsed, 4),
+            'us_per_instance': round(elapsed / len(instances) * 1e6, 2),
+        })
+        print(f"{len(instances):>8} instances: {elapsed:8.3f}s, {results[-1]['us_per_instance']:8.2f} us/instance")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,5000,10000,25000,50000', help='Comma-separated instance counts')
+    parser.add_argument('--instances-per-set', type=int, default=500)
+    args = parser.parse_args()
+    setup_django()
+    run([int(size) for size in args.sizes.split(',')], args.instances_per_set)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Compares the per-instance cost of resolving the initialize.json / optional.json fields with the compiled field plan
+against the previous per-field resolution (get_prioritized_value / try_to_get_from_dict for every field), and checks
+that both produce the same values.
+
+    python -m benchmarks.bench_field_plan --instances 20000
+"""
+import argparse
+
+from benchmarks.common import setup_django, timed
+
+
+def resolve_legacy(practitest, test, test_set):
+    from connector.static.core.static_methods import try_to_get_from_dict
+    test_set_attributes = test_set['attributes']
+    test_set_custom_fields = test_set_attributes['custom-fields']
+    test_custom_fields = test['attributes']['custom-fields']
+    return {
+        'automation_run_only': str(test_set_custom_fields[practitest.PRACTITEST_AUTOMATION_RUN_ONLY]),
+        'aws_instance_type': str(test_set_custom_fields[practitest.PRACTITEST_AWS_INSTANCE_TYPE]),
+        'debug': practitest.get_prioritized_value(practitest.PRACTITEST_DEBUG, test_set, test, is_boolean=True),
+        'execution_type': str(practitest.EXECUTION_TYPE),
+        'sync_exec': try_to_get_from_dict(test_set_custom_fields, practitest.SYNCHRONOUS_EXECUTION, is_boolean=True),
+        'environment': try_to_get_from_dict(test_set_custom_fields, practitest.ENVIRONMENT),
+        'browser': practitest.get_prioritized_value(practitest.BROWSER, test_set, test, is_boolean=True),
+        'update_host_file': try_to_get_from_dict(test_set_custom_fields, practitest.UPDATE_HOST_FILE, is_boolean=True),
+        'execute_at_night': try_to_get_from_dict(test_set_custom_fields, practitest.EXECUTE_AT_NIGHT, is_boolean=True),
+        'verify_versions': try_to_get_from_dict(test_set_custom_fields, practitest.VERIFY_VERSIONS, is_boolean=True),
+        'kmsBuild': try_to_get_from_dict(test_set_custom_fields, practitest.KMS_BUILD),
+        'playerVersion': try_to_get_from_dict(test_set_custom_fields, practitest.PLAYER_VERSION),
+        'assigned_to': try_to_get_from_dict(test_set_attributes, practitest.ASSIGNED_TO),
+        'automation_arguments': try_to_get_from_dict(test_set_custom_fields, practitest.AUTOMATION_ARGUMENTS, default_value=''),
+        'partner': try_to_get_from_dict(test_set_custom_fields, practitest.PARTNER, default_value=''),
+        'base_url': try_to_get_from_dict(test_set_custom_fields, practitest.BASE_URL, default_value=''),
+        'admin_username': try_to_get_from_dict(test_custom_fields, practitest.ADMIN_USERNAME, default_value=''),
+        'admin_password': try_to_get_from_dict(test_custom_fields, practitest.ADMIN_PASSWORD, default_value=''),
+        'login_username': try_to_get_from_dict(test_custom_fields, practitest.LOGIN_USERNAME, default_value=''),
+        'login_password': try_to_get_from_dict(test_custom_fields, practitest.LOGIN_PASSWORD, default_value=''),
+        'playerVersionV7': try_to_get_from_dict(test_custom_fields, practitest.PLAYER_VERSION_V7, default_value=''),
+    }
+
+
+def run(instance_count, instances_per_set):
+    from connector.static.core.kms.kms_practitest import KmsPractiTest
+    from benchmarks import synthetic
+
+    test_sets, instances = synthetic.make_dataset(max(1, instance_count // instances_per_set), instances_per_set)
+    test_sets_by_id = {test_set['id']: test_set for test_set in test_sets}
+    pairs = [(test, test_sets_by_id[str(test['attributes']['set-id'])]) for test in instances]
+    practitest = KmsPractiTest(synthetic.load_optional_data(), **synthetic.load_initial_data())
+
+    legacy, legacy_seconds = timed(lambda: [resolve_legacy(practitest, test, test_set) for test, test_set in pairs])
+    field_plan = practitest.get_field_plan()
+    planned, plan_seconds = timed(lambda: [dict(zip(field_plan.keys, field_plan.resolve_values(test, test_set)))
+                                           for test, test_set in pairs])
+    if legacy != planned:
+        raise AssertionError('Field plan values differ from the legacy resolution')
+
+    result = {
+        'instances': len(pairs),
+        'legacy_us_per_instance': round(legacy_seconds / len(pairs) * 1e6, 2),
+        'plan_us_per_instance': round(plan_seconds / len(pairs) * 1e6, 2),
+        'speedup': round(legacy_seconds / plan_seconds, 1),
+    }
+    print(f"{result['instances']} instances: legacy {result['legacy_us_per_instance']} us/instance, "
+          f"plan {result['plan_us_per_instance']} us/instance, {result['speedup']}x")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--instances', type=int, default=20000)
+    parser.add_argument('--instances-per-set', type=int, default=500)
+    args = parser.parse_args()
+    setup_django()
+    run(args.instances, args.instances_per_set)
+
+
+if __name__ == '__main__':
+    main()
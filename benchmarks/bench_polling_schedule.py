@@ -0,0 +1,139 @@
+"""
+Simulates blocks polling PractiTest for a day, comparing the previous fixed 10 seconds cycle with the adaptive
+polling schedule, alone and with the trigger probe the supervisor runs instead of the cycles of an idle block (backed
+off up to --pickup-target seconds): API polls (cycles and probes) and full cycles per block, the pickup latency of new
+triggers (trigger time to the next poll) and the largest number of blocks polling within the same second after their
+first cycle.
+
+Triggers arrive randomly (Poisson) at --triggers-per-day per block; a poll finding a trigger counts as a cycle
+that found work.
+
+    python -m benchmarks.bench_polling_schedule --blocks 50 --triggers-per-day 12
+"""
+import argparse
+import random
+import statistics
+from collections import Counter
+
+DAY = 24 * 3600
+
+
+class Polling:
+    """
+    Polls of a block running a cycle every interval(found_work) seconds.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def is_cycle(self, now, found_work):
+        return True
+
+    def next_delay(self, now, found_work, cycle):
+        return self.interval(found_work)
+
+
+class ProbedPolling:
+    """
+    Polls of a block scheduled by the supervisor with a probe: once a cycle found no work only the probe runs, at
+    intervals backed off up to the pickup target, and a probe finding work runs the cycle at once.
+    """
+
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self.probing = False
+
+    def is_cycle(self, now, found_work):
+        return found_work or not self.probing
+
+    def next_delay(self, now, found_work, cycle):
+        self.probing = not found_work
+        if self.probing:
+            return self.schedule.next_probe_interval()
+        return self.schedule.next_interval(found_work)
+
+
+def simulate(make_polling, block_count, triggers_per_day, seed):
+    rng = random.Random(seed)
+    polls = 0
+    cycles = 0
+    latencies = []
+    polls_per_second = Counter()
+    for block in range(block_count):
+        triggers = []
+        t = rng.expovariate(triggers_per_day / DAY)
+        while t < DAY:
+            triggers.append(t)
+            t += rng.expovariate(triggers_per_day / DAY)
+        polling = make_polling(block)
+        now = 0.0  # All blocks are started together
+        pending = 0
+        while now < DAY:
+            polls += 1
+            if now:
+                polls_per_second[int(now)] += 1
+            found = []
+            while pending < len(triggers) and triggers[pending] <= now:
+                found.append(triggers[pending])
+                pending += 1
+            latencies.extend(now - trigger for trigger in found)
+            cycle = polling.is_cycle(now, bool(found))
+            cycles += cycle
+            now += polling.next_delay(now, bool(found), cycle)
+    return {
+        'polls_per_block_per_hour': round(polls / block_count / 24, 1),
+        'cycles_per_block_per_hour': round(cycles / block_count / 24, 1),
+        'pickup_p50_seconds': round(statistics.median(latencies), 1) if latencies else None,
+        'pickup_p95_seconds': round(sorted(latencies)[int(len(latencies) * 0.95)], 1) if latencies else None,
+        'pickup_max_seconds': round(max(latencies), 1) if latencies else None,
+        'max_blocks_polling_per_second': max(polls_per_second.values()),
+    }
+
+
+def run(block_count, triggers_per_day, min_interval, max_interval, pickup_target, jitter, seed):
+    from connector.supervisor import AdaptivePollingSchedule
+
+    def fixed(block):
+        # start_service slept another 10 seconds after dispatching
+        return Polling(lambda found_work: 10 + (10 if found_work else 0))
+
+    def adaptive(block):
+        return Polling(AdaptivePollingSchedule(min_interval, max_interval, jitter=jitter).next_interval)
+
+    def probed(block):
+        return ProbedPolling(AdaptivePollingSchedule(min_interval, max_interval, jitter=jitter,
+                                                     probe_max_interval=pickup_target))
+
+    random.seed(seed)
+    results = {'fixed': simulate(fixed, block_count, triggers_per_day, seed),
+               'adaptive': simulate(adaptive, block_count, triggers_per_day, seed),
+               'probed': simulate(probed, block_count, triggers_per_day, seed)}
+    for name, result in results.items():
+        print(f"{name:8} {result['polls_per_block_per_hour']:>6} polls/block/hour "
+              f"({result['cycles_per_block_per_hour']} full cycles), pickup p50 "
+              f"{result['pickup_p50_seconds']}s p95 {result['pickup_p95_seconds']}s max {result['pickup_max_seconds']}s, "
+              f"max {result['max_blocks_polling_per_second']} blocks polling in the same second")
+    for name in ('adaptive', 'probed'):
+        print(f"{name}: full cycles reduced "
+              f"{results['fixed']['cycles_per_block_per_hour'] / results[name]['cycles_per_block_per_hour']:.1f}x, "
+              f"API polls reduced {results['fixed']['polls_per_block_per_hour'] / results[name]['polls_per_block_per_hour']:.1f}x")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blocks', type=int, default=50)
+    parser.add_argument('--triggers-per-day', type=float, default=12)
+    parser.add_argument('--min-interval', type=float, default=10)
+    parser.add_argument('--max-interval', type=float, default=80)
+    parser.add_argument('--pickup-target', type=float, default=60,
+                        help='Maximum seconds between two probes of an idle block (BLOCK_PICKUP_TARGET)')
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.blocks, args.triggers_per_day, args.min_interval, args.max_interval, args.pickup_target, args.jitter,
+        args.seed)
+
+
+if __name__ == '__main__':
+    main()
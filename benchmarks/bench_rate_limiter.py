@@ -0,0 +1,142 @@
+"""
+Runs block workers in several processes against a local server enforcing a PractiTest-like rate limit (429 with
+Retry-After when its token bucket is empty), once with every worker backing off on its own and once drawing from
+the host-wide RateLimiter configured a little below the server limit (--headroom), and reports the throughput
+and the number of 429 responses.
+
+    python -m benchmarks.bench_rate_limiter --limit 50 --headroom 0.9 --processes 2 --threads 4 --requests 50
+"""
+import argparse
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+class LimitedServer:
+    """
+    Local server answering 200, or 429 with a Retry-After header once more than limit requests per second arrive.
+    """
+
+    def __init__(self, limit, burst):
+        server = self
+        self.limit = limit
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.ok = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                retry_after = server.take()
+                self.send_response(429 if retry_after else 200)
+                if retry_after:
+                    self.send_header('Retry-After', str(retry_after))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/api/v2/projects/1/sets.json?api_token=bench'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def take(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.limit)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.ok += 1
+                return 0
+            self.throttled += 1
+            return max(1, math.ceil((1 - self.tokens) / self.limit))
+
+
+def worker_uncoordinated(url, request_count):
+    session = requests.Session()
+    throttled = 0
+    for _ in range(request_count):
+        while True:
+            r = session.get(url)
+            if r.status_code != 429:
+                break
+            throttled += 1
+            time.sleep(float(r.headers['Retry-After']))
+    return throttled
+
+
+def worker_limited(url, request_count, state_dir, limit, burst):
+    from connector.static.core.rate_limiter import RateLimiter, account_key, parse_retry_after
+
+    limiter = RateLimiter(requests_per_minute=limit * 60, burst=burst, state_dir=state_dir)
+    account = account_key(url)
+    session = requests.Session()
+    throttled = 0
+    for _ in range(request_count):
+        while True:
+            limiter.acquire(account)
+            r = session.get(url)
+            if r.status_code != 429:
+                break
+            throttled += 1
+            limiter.pause(account, parse_retry_after(r.headers.get('Retry-After')))
+    return throttled
+
+
+def run_process(mode, url, thread_count, request_count, state_dir, limit, burst):
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        if mode == 'limited':
+            futures = [executor.submit(worker_limited, url, request_count, state_dir, limit, burst)
+                       for _ in range(thread_count)]
+        else:
+            futures = [executor.submit(worker_uncoordinated, url, request_count) for _ in range(thread_count)]
+        return sum(future.result() for future in futures)
+
+
+def run(limit, burst, headroom, process_count, thread_count, request_count):
+    results = {}
+    total = process_count * thread_count * request_count
+    for mode in ('uncoordinated', 'limited'):
+        server = LimitedServer(limit, burst)
+        with tempfile.TemporaryDirectory() as state_dir, ProcessPoolExecutor(max_workers=process_count) as executor:
+            start = time.perf_counter()
+            futures = [executor.submit(run_process, mode, server.url, thread_count, request_count, state_dir,
+                                       limit * headroom, burst) for _ in range(process_count)]
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - start
+        server.httpd.shutdown()
+        results[mode] = {'seconds': round(elapsed, 2), 'requests_per_second': round(total / elapsed, 1),
+                         'throttled': server.throttled}
+        print(f"{mode:14} {total} requests in {results[mode]['seconds']}s "
+              f"({results[mode]['requests_per_second']} req/s, server limit {limit}), {server.throttled} x 429")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limit', type=float, default=50, help='Requests per second allowed by the server')
+    parser.add_argument('--burst', type=int, default=10)
+    parser.add_argument('--headroom', type=float, default=0.9, help='Fraction of the server limit the limiter allows')
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4, help='Block workers per process')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per worker')
+    args = parser.parse_args()
+    run(args.limit, args.burst, args.headroom, args.processes, args.threads, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Simulates blocks of the same project with overlapping filter ID lists fetching their filters and instance pages
+at the same time, with and without the request coalescer, and reports the number of network calls and the
+coalescer counters. As in the blocks, only the filter responses are cached, the instance pages are only coalesced
+while in flight.
+
+    python -m benchmarks.bench_request_coalescing --blocks 20 --filters 6 --filters-per-block 3 --latency 0.05
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CountingFetcher:
+    """
+    Stands in for the network: every fetch sleeps latency seconds and is counted.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, url):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        return url
+
+
+def block_urls(filter_ids, pages):
+    urls = [f'/sets.json?filter-id={filter_id}' for filter_id in filter_ids]
+    urls += [f'/instances.json?set-ids={",".join(filter_ids)}&page[number]={page}' for page in range(1, pages + 1)]
+    return urls
+
+
+def run_blocks(get, blocks, latency):
+    fetcher = CountingFetcher(latency)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(blocks)) as executor:
+        list(executor.map(lambda urls: [get(url, fetcher) for url in urls], blocks))
+    return fetcher.calls, time.perf_counter() - start
+
+
+def run(block_count, filter_count, filters_per_block, pages, latency, seed):
+    from connector.static.core.request_coalescer import RequestCoalescer
+
+    rng = random.Random(seed)
+    groups = [sorted(rng.sample([str(i) for i in range(filter_count)], filters_per_block)) for _ in range(block_count)]
+    blocks = [block_urls(filter_ids, pages) for filter_ids in groups]
+    requests = sum(len(urls) for urls in blocks)
+
+    direct_calls, direct_seconds = run_blocks(lambda url, fetcher: fetcher.fetch(url), blocks, latency)
+    coalescer = RequestCoalescer(ttl=5)
+
+    def coalesced_get(url, fetcher):
+        return coalescer.get(url, lambda: fetcher.fetch(url), cache='/sets.json' in url)
+
+    coalesced_calls, coalesced_seconds = run_blocks(coalesced_get, blocks, latency)
+    stats = coalescer.stats()
+    print(f'{block_count} blocks, {requests} GET requests: {direct_calls} network calls without coalescing '
+          f'({direct_seconds:.2f}s), {coalesced_calls} with coalescing ({coalesced_seconds:.2f}s)')
+    print(f"coalescer: {stats['misses']} misses, {stats['coalesced']} coalesced, {stats['hits']} cache hits, "
+          f"{stats['cached']} cached results")
+    return {'requests': requests, 'direct_calls': direct_calls, 'coalesced_calls': coalesced_calls, **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blocks', type=int, default=20)
+    parser.add_argument('--filters', type=int, default=6, help='Distinct filters of the project')
+    parser.add_argument('--filters-per-block', type=int, default=3)
+    parser.add_argument('--pages', type=int, default=5, help='Instance pages per block')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.blocks, args.filters, args.filters_per_block, args.pages, args.latency, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,377 @@
+"""
+Soak test of the web + worker stack with many blocks and dashboards. Starts the Django server (manage.py runserver,
+which also runs the block workers) against a local fake PractiTest server, creates N blocks through the views,
+starts them, and polls the server from M dashboard clients at the dashboard cadence (5 seconds) for a fixed
+duration, while a control client keeps stopping and restarting blocks. Reports the request latency percentiles per
+view, the SQLite lock errors, the worker RSS growth and the log table growth, and stores them as JSON to compare runs.
+
+Every run works in a new temporary directory holding its own SQLite database (migrated before the server starts),
+block state cache, server log and dispatched tests, so the dashboard database is never touched. The blocks are
+deleted at the end unless --keep.
+
+    python -m benchmarks.bench_soak --blocks 40 --dashboards 5 --duration 600
+    python -m benchmarks.bench_soak --blocks 40 --client-mode per-block --baseline benchmarks/results/soak-....json
+"""
+import argparse
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.common import compare_results, save_results, setup_django
+from benchmarks.fake_practitest import FakePractiTest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCK_ERROR = 'database is locked'
+CLIENT_MODES = ('snapshot', 'per-block')
+LOWER_IS_BETTER = {'errors', 'sqlite_lock_errors', 'sqlite_lock_errors_server_log', 'late_polls',
+                   'worker_rss_growth_mib', 'log_rows_per_minute'}
+
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank percentile of a list of values, None if empty.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def process_rss_bytes(pid):
+    """
+    Returns the current resident set size of a process, in bytes.
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    output = subprocess.run(['ps', '-o', 'rss=', '-p', str(pid)], capture_output=True, text=True).stdout
+    return int(output.strip() or 0) * 1024
+
+
+class Recorder:
+    """
+    Collects the latency and the outcome of every request, by view.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.lock_errors = 0
+        self.late_polls = 0
+        self._lock = threading.Lock()
+
+    def request(self, session, view, method, url, **kwargs):
+        """
+        Sends a request and records it.
+
+        :return: The response, or None if the request failed.
+        """
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=60, **kwargs)
+        except requests.RequestException:
+            response = None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.setdefault(view, []).append(elapsed)
+            if response is None or response.status_code >= 500:
+                self.errors[view] = self.errors.get(view, 0) + 1
+                if response is not None and LOCK_ERROR in response.text:
+                    self.lock_errors += 1
+        return response if response is not None and response.status_code < 500 else None
+
+    def late(self):
+        with self._lock:
+            self.late_polls += 1
+
+
+def start_server(port, env, log_file):
+    """
+    Starts manage.py runserver and waits until it answers.
+    """
+    process = subprocess.Popen([sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload'],
+                               cwd=BASE_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'The server exited with status {process.returncode}, see {log_file.name}')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/get_supervisor_status/', timeout=5)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'The server did not start, see {log_file.name}')
+
+
+def block_data(index, filter_id, dispatch_dir, poll_interval):
+    """
+    Returns the start_block request body of the block of a fake PractiTest filter. All blocks use the API token of
+    a single account, and every block dispatches its tests to its own JSONL file.
+    """
+    data = {'app_name': 'kms', 'pt_username': 'soak@example.com', 'pt_token': 'soak-token',
+            'aws_access_key': 'soak', 'aws_secret_key': 'soak', 'filter_id_list': str(filter_id),
+            'dispatch_sink': 'jsonl', 'dispatch_target': os.path.join(dispatch_dir, f'block-{index}.jsonl')}
+    if poll_interval:
+        data['poll_min_interval'] = data['poll_max_interval'] = poll_interval
+    return data
+
+
+def run_dashboard(recorder, base_url, block_ids, client_mode, interval, stop):
+    """
+    Polls the server like a dashboard without live updates: the blocks page once, then every interval seconds
+    either a dashboard snapshot with the cursor of every block (the current dashboard), or the console output and
+    the status of every block (the previous dashboard).
+    """
+    session = requests.Session()
+    recorder.request(session, 'list_blocks', 'GET', f'{base_url}/list_blocks/')
+    since = {}
+    next_poll = time.monotonic() + random.uniform(0, interval)
+    while not stop.wait(max(0.0, next_poll - time.monotonic())):
+        if client_mode == 'snapshot':
+            cursors = ','.join(f'{block_id}:{log_id}' for block_id, log_id in since.items())
+            response = recorder.request(session, 'get_dashboard_snapshot', 'GET', f'{base_url}/get_dashboard_snapshot/',
+                                        params={'ids': ','.join(map(str, block_ids)), 'since': cursors})
+            for block in response.json()['blocks'] if response is not None else ():
+                if block['last_log_id'] is not None:
+                    since[block['id']] = block['last_log_id']
+        else:
+            for block_id in block_ids:
+                recorder.request(session, 'get_console_output', 'GET', f'{base_url}/get_console_output/{block_id}/')
+                recorder.request(session, 'get_block_status', 'GET', f'{base_url}/get_block_status/{block_id}/')
+        next_poll += interval
+        if next_poll < time.monotonic():
+            # The polls took longer than the interval, the dashboard falls behind its cadence
+            recorder.late()
+            next_poll = time.monotonic()
+
+
+def run_churn(recorder, base_url, blocks, interval, stop):
+    """
+    Stops and restarts a random block every interval seconds, as users do from the dashboards.
+    """
+    session = requests.Session()
+    while not stop.wait(interval):
+        block_id, data = random.choice(blocks)
+        recorder.request(session, 'stop_block', 'POST', f'{base_url}/stop_block/{block_id}/')
+        recorder.request(session, 'start_block', 'POST', f'{base_url}/start_block/{block_id}/', json=data)
+
+
+def count_lock_errors(server_log):
+    """
+    Counts the server log records (with their traceback) mentioning a SQLite lock error.
+    """
+    from django.conf import settings
+
+    server_log.seek(0)
+    records = server_log.read().split(settings.LOG_RECORD_PREFIX)[1:]
+    return sum(1 for record in records if LOCK_ERROR in record)
+
+
+def count_lines(directory):
+    count = 0
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), 'rb') as f:
+            count += sum(1 for _ in f)
+    return count
+
+
+def run(work_dir, block_count, dashboards, duration, interval, client_mode, churn_interval, sets_per_block,
+        instances_per_set, page_size, latency, retrigger_interval, poll_interval, sample_interval, keep):
+    from django.conf import settings
+    from django.db import OperationalError
+    from connector.models import LogEntry
+
+    database = str(settings.DATABASES['default']['NAME'])
+
+    def log_rows():
+        try:
+            return LogEntry.objects.count()
+        except OperationalError:
+            return None
+
+    def database_bytes():
+        return sum(os.path.getsize(path) for path in (database, database + '-wal') if os.path.exists(path))
+
+    recorder = Recorder()
+    stop = threading.Event()
+    dispatch_dir = os.path.join(work_dir, 'dispatch')
+    os.makedirs(dispatch_dir)
+    port = 18000 + os.getpid() % 1000
+    base_url = f'http://127.0.0.1:{port}'
+
+    with FakePractiTest(block_count * sets_per_block, instances_per_set, page_size, block_count, latency) as server, \
+            open(os.path.join(work_dir, 'server.log'), 'w+') as server_log:
+        env = dict(os.environ, PRACTITEST_API_URL=server.api_url, CHANNEL_LAYER_BACKEND='memory',
+                   PRACTITEST_RATE_LIMIT_DIR=os.path.join(work_dir, 'rate_limits'), PYTHONUNBUFFERED='1')
+        process = start_server(port, env, server_log)
+        session = requests.Session()
+        blocks = []
+        try:
+            rss_start = process_rss_bytes(process.pid)
+            rows_start, bytes_start = log_rows(), database_bytes()
+            for index in range(block_count):
+                response = recorder.request(session, 'create_block', 'POST', f'{base_url}/create_block/')
+                if response is None:
+                    raise RuntimeError(f'create_block failed, see {server_log.name}')
+                blocks.append((response.json()['block']['id'], block_data(index, index + 1, dispatch_dir,
+                                                                          poll_interval)))
+            for block_id, data in blocks:
+                recorder.request(session, 'start_block', 'POST', f'{base_url}/start_block/{block_id}/', json=data)
+            print(f'{block_count} blocks started, {dashboards} {client_mode} dashboards polling every {interval}s '
+                  f'for {duration}s, logs in {work_dir}')
+
+            block_ids = [block_id for block_id, _ in blocks]
+            threads = [threading.Thread(target=run_dashboard, daemon=True,
+                                        args=(recorder, base_url, block_ids, client_mode, interval, stop))
+                       for _ in range(dashboards)]
+            if churn_interval:
+                threads.append(threading.Thread(target=run_churn, daemon=True,
+                                                args=(recorder, base_url, blocks, churn_interval, stop)))
+            for thread in threads:
+                thread.start()
+
+            start = time.monotonic()
+            rss_max = rss_start
+            samples = []
+            next_retrigger = start + retrigger_interval
+            while time.monotonic() - start < duration:
+                time.sleep(min(sample_interval, max(0.0, start + duration - time.monotonic())))
+                if process.poll() is not None:
+                    raise RuntimeError(f'The server exited with status {process.returncode}, see {server_log.name}')
+                if retrigger_interval and time.monotonic() >= next_retrigger:
+                    server.retrigger()
+                    next_retrigger += retrigger_interval
+                rss = process_rss_bytes(process.pid)
+                rss_max = max(rss_max, rss)
+                samples.append({'seconds': round(time.monotonic() - start, 1), 'rss_mib': round(rss / 2 ** 20, 1),
+                                'log_rows': log_rows()})
+                print(f"  {samples[-1]['seconds']:>7}s  RSS {samples[-1]['rss_mib']} MiB, "
+                      f"{samples[-1]['log_rows']} log rows, {sum(len(v) for v in recorder.latencies.values())} requests")
+            stop.set()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - start
+            rss_end = process_rss_bytes(process.pid)
+            rows_end, bytes_end = log_rows(), database_bytes()
+            supervisor = session.get(f'{base_url}/get_supervisor_status/', timeout=60).json()
+
+            for block_id, _ in blocks:
+                recorder.request(session, 'stop_block', 'POST', f'{base_url}/stop_block/{block_id}/')
+        finally:
+            stop.set()
+            if not keep:
+                for block_id, _ in blocks:
+                    recorder.request(session, 'delete_block', 'POST', f'{base_url}/delete_block/{block_id}/')
+            process.terminate()
+            process.wait(timeout=30)
+        server_lock_errors = count_lock_errors(server_log)
+        api_calls = dict(server.calls)
+
+    block_states = supervisor['blocks'].values()
+    metrics = {
+        'requests': sum(len(values) for values in recorder.latencies.values()),
+        'errors': sum(recorder.errors.values()),
+        'sqlite_lock_errors': recorder.lock_errors,
+        'sqlite_lock_errors_server_log': server_lock_errors,
+        'late_polls': recorder.late_polls,
+        'worker_rss_start_mib': round(rss_start / 2 ** 20, 1),
+        'worker_rss_max_mib': round(rss_max / 2 ** 20, 1),
+        'worker_rss_growth_mib': round((rss_end - rss_start) / 2 ** 20, 1),
+        'log_rows_added': rows_end - rows_start if None not in (rows_start, rows_end) else None,
+        'log_rows_per_minute': round((rows_end - rows_start) / elapsed * 60) if None not in (rows_start, rows_end) else None,
+        'database_growth_mib': round((bytes_end - bytes_start) / 2 ** 20, 2),
+        'block_cycles': sum(state['cycles'] for state in block_states),
+        'blocks_with_errors': sum(1 for state in block_states if state['last_error']),
+        'practitest_api_calls': sum(api_calls.values()),
+        'messages_dispatched': count_lines(dispatch_dir),
+    }
+    for view, values in sorted(recorder.latencies.items()):
+        for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            metrics[f'{view}_{name}_ms'] = round(percentile(values, fraction) * 1000, 1)
+            LOWER_IS_BETTER.add(f'{view}_{name}_ms')
+        metrics[f'{view}_errors'] = recorder.errors.get(view, 0)
+    results = {
+        'benchmark': 'soak',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'block_supervisor_max_workers': settings.BLOCK_SUPERVISOR_MAX_WORKERS},
+        'config': {'blocks': block_count, 'dashboards': dashboards, 'duration': duration, 'interval': interval,
+                   'client_mode': client_mode, 'churn_interval': churn_interval, 'sets_per_block': sets_per_block,
+                   'instances_per_set': instances_per_set, 'page_size': page_size, 'latency': latency,
+                   'retrigger_interval': retrigger_interval, 'poll_interval': poll_interval},
+        'metrics': metrics,
+        'samples': samples,
+    }
+
+    print(f'{block_count} blocks, {dashboards} dashboards, {round(elapsed)}s:')
+    for view, values in sorted(recorder.latencies.items()):
+        print(f"  {view:24} {len(values):>6} requests, p50 {metrics[f'{view}_p50_ms']} ms, "
+              f"p95 {metrics[f'{view}_p95_ms']} ms, p99 {metrics[f'{view}_p99_ms']} ms, "
+              f"{metrics[f'{view}_errors']} errors")
+    print(f"  SQLite lock errors: {metrics['sqlite_lock_errors']} in responses, "
+          f"{metrics['sqlite_lock_errors_server_log']} in the server log; {metrics['late_polls']} late polls")
+    print(f"  worker RSS {metrics['worker_rss_start_mib']} -> {round(rss_end / 2 ** 20, 1)} MiB "
+          f"(max {metrics['worker_rss_max_mib']} MiB)")
+    print(f"  log table +{metrics['log_rows_added']} rows ({metrics['log_rows_per_minute']}/min), "
+          f"database +{metrics['database_growth_mib']} MiB")
+    print(f"  {metrics['block_cycles']} block cycles, {metrics['blocks_with_errors']} blocks with errors, "
+          f"{metrics['practitest_api_calls']} PractiTest calls, {metrics['messages_dispatched']} messages dispatched")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blocks', type=int, default=10)
+    parser.add_argument('--dashboards', type=int, default=3)
+    parser.add_argument('--duration', type=float, default=120, help='Seconds of polling')
+    parser.add_argument('--interval', type=float, default=5, help='Seconds between the polls of a dashboard')
+    parser.add_argument('--client-mode', choices=CLIENT_MODES, default='snapshot',
+                        help='snapshot: one dashboard snapshot per poll, per-block: the console output and the '
+                             'status of every block per poll')
+    parser.add_argument('--churn-interval', type=float, default=15,
+                        help='Seconds between the restarts of a random block, 0 to disable')
+    parser.add_argument('--sets-per-block', type=int, default=2)
+    parser.add_argument('--instances-per-set', type=int, default=50)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds of every PractiTest request')
+    parser.add_argument('--retrigger-interval', type=float, default=30,
+                        help='Seconds after which every test set is triggered again, 0 to trigger them once')
+    parser.add_argument('--poll-interval', type=int,
+                        help='Seconds between the cycles of a block, BLOCK_POLL_INTERVAL by default')
+    parser.add_argument('--sample-interval', type=float, default=5, help='Seconds between the RSS/log samples')
+    parser.add_argument('--keep', action='store_true', help='Keep the blocks and their log entries in the soak database')
+    parser.add_argument('--output', help='JSON file of the results, benchmarks/results/ by default')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change reported as a regression')
+    args = parser.parse_args()
+    # The driver and the server both use the soak settings, with the database of this run
+    work_dir = tempfile.mkdtemp(prefix='soak-')
+    os.environ['SOAK_WORK_DIR'] = work_dir
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.soak_settings'
+    setup_django()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    results = run(work_dir, args.blocks, args.dashboards, args.duration, args.interval, args.client_mode,
+                  args.churn_interval, args.sets_per_block, args.instances_per_set, args.page_size, args.latency,
+                  args.retrigger_interval, args.poll_interval, args.sample_interval, args.keep)
+    print(f"results stored in {save_results('soak', results, args.output)}")
+    if args.baseline:
+        print(f'compared with {args.baseline}:')
+        if compare_results(args.baseline, results, LOWER_IS_BETTER, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
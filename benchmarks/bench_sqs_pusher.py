@@ -0,0 +1,91 @@
+"""
+Pushes synthetic test messages to a local SQS stand-in, comparing the previous dispatch (sequential 10-message
+batches) with SQSPusher (size-aware packing, concurrent batches and retries of failed entries), and checks that
+every message is delivered exactly once.
+
+    python -m benchmarks.bench_sqs_pusher --messages 5000 --latency 0.02 --failure-rate 0.05
+"""
+import argparse
+import json
+
+from benchmarks.common import setup_django, timed
+from benchmarks.local_sqs import LocalSQSClient
+
+QUEUE_URL = 'https://sqs.local/000000000000/automation-hub'
+
+
+def push_sequential(client, messages):
+    """
+    The previous dispatch, returns the number of batches SQS rejected for exceeding the payload limit.
+    """
+    rejected = 0
+    for i in range(0, len(messages), 10):
+        batch = messages[i:i + 10]
+        entries = [{'Id': str(j), 'MessageBody': json.dumps(msg)} for j, msg in enumerate(batch)]
+        try:
+            client.send_message_batch(QueueUrl=QUEUE_URL, Entries=entries)
+        except ValueError:
+            rejected += 1
+    return rejected
+
+
+def make_messages(message_count, padding):
+    from benchmarks import synthetic
+    from connector.static.core.kms.kms_practitest import KmsPractiTest
+
+    test_sets, instances = synthetic.make_dataset(max(1, message_count // 100), 100)
+    practitest = KmsPractiTest(synthetic.load_optional_data(), **synthetic.load_initial_data())
+    synthetic.serve_instances(practitest, instances[:message_count])
+    messages = [record.to_message() for record in practitest.get_dict_of_tests_objects(test_sets)]
+    for message in messages:
+        message['automation_arguments'] = 'x' * padding
+    return messages
+
+
+def run(message_count, latency, failure_rate, max_workers, padding):
+    from connector.static.core import codec
+    from connector.static.core.aws_sqs_pusher import SQSPusher
+
+    messages = make_messages(message_count, padding)
+
+    sequential_client = LocalSQSClient(latency=latency)
+    sequential_rejected, sequential_seconds = timed(push_sequential, sequential_client, messages)
+
+    client = LocalSQSClient(latency=latency, failure_rate=failure_rate)
+    pusher = SQSPusher(None, None, client=client, max_workers=max_workers, backoff=latency)
+    responses, pusher_seconds = timed(pusher.push_to_queue, QUEUE_URL, messages)
+
+    failed = sum(len(response['Failed']) for response in responses)
+    delivered = client.queues.get(QUEUE_URL, [])
+    if failed or sorted(delivered) != sorted(codec.dumps(message) for message in messages):
+        raise AssertionError(f'{failed} failed, {len(delivered)} of {len(messages)} messages delivered')
+
+    result = {
+        'messages': len(messages),
+        'sequential_seconds': round(sequential_seconds, 3),
+        'sequential_calls': sequential_client.calls,
+        'sequential_rejected_batches': sequential_rejected,
+        'pusher_seconds': round(pusher_seconds, 3),
+        'pusher_calls': client.calls,
+        'speedup': round(sequential_seconds / pusher_seconds, 1),
+    }
+    print(f"{result['messages']} messages: sequential {result['sequential_seconds']}s "
+          f"({result['sequential_calls']} calls, {sequential_rejected} batches rejected), pusher {result['pusher_seconds']}s ({result['pusher_calls']} calls, "
+          f"{failure_rate:.0%} entry failures retried), {result['speedup']}x")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds per send_message_batch call')
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    parser.add_argument('--max-workers', type=int, default=8)
+    parser.add_argument('--padding', type=int, default=0, help='Extra characters per message')
+    args = parser.parse_args()
+    setup_django()
+    run(args.messages, args.latency, args.failure_rate, args.max_workers, args.padding)
+
+
+if __name__ == '__main__':
+    main()
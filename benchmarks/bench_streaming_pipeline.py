@@ -0,0 +1,92 @@
+"""
+Compares a cycle collecting every test before dispatching them (get_dict_of_tests_objects then dispatch_tests) with
+the streaming cycle dispatching the tests of every page as soon as it is fetched (iter_dispatch_records through
+dispatch_test_stream). Pages are served with a simulated round trip and dispatched to a local SQS stand-in. Each
+variant runs in its own process and reports the time to the first dispatch, the cycle time and its peak RSS growth.
+
+    python -m benchmarks.bench_streaming_pipeline --instances 20000 --latency 0.05 --window 16
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.common import peak_rss_bytes, setup_django
+from benchmarks.local_sqs import LocalSQSClient
+
+QUEUE_URL = 'https://sqs.local/000000000000/automation-hub'
+VARIANTS = ('materialized', 'streaming')
+
+
+def run_variant(variant, instance_count, latency, window):
+    from benchmarks import synthetic
+    from connector.static.core import codec
+    from connector.static.core.dispatch_sinks import SQSSink
+    from connector.static.core.kms.kms_practitest import KmsPractiTest
+
+    page_count = max(1, instance_count // synthetic.PAGE_SIZE)
+    test_sets = [synthetic.make_test_set(set_id) for set_id in range(1, page_count + 1)]
+    responses = [codec.dumps_bytes(synthetic.make_instance_page(page, page_count)) for page in range(1, page_count + 1)]
+
+    def get_instances_page(url, page):
+        time.sleep(latency)
+        return codec.loads(responses[page - 1])
+
+    client = LocalSQSClient(latency=latency / 5)
+    first_dispatch = []
+    sink = SQSSink(QUEUE_URL, client=client)
+    send = sink.send
+    sink.send = lambda messages: first_dispatch.append(time.perf_counter()) or send(messages)
+
+    practitest = KmsPractiTest(synthetic.load_optional_data(), **synthetic.load_initial_data())
+    practitest.PAGE_WINDOW = window
+    practitest.get_instances_page = get_instances_page
+    practitest.get_dispatch_sink = lambda: sink
+    practitest.get_field_plan()
+
+    baseline = peak_rss_bytes()
+    start = time.perf_counter()
+    if variant == 'materialized':
+        result = practitest.dispatch_tests(practitest.get_dict_of_tests_objects(test_sets))
+    else:
+        result = practitest.dispatch_test_stream(practitest.iter_dispatch_records(test_sets))
+    elapsed = time.perf_counter() - start
+    if result.sent != len(client.queues[QUEUE_URL]) or result.failed:
+        raise AssertionError(f'{result.sent} sent, {result.failed} failed, {len(client.queues[QUEUE_URL])} delivered')
+    return {'variant': variant, 'instances': page_count * synthetic.PAGE_SIZE, 'dispatched': result.sent,
+            'first_dispatch_seconds': round(first_dispatch[0] - start, 3), 'cycle_seconds': round(elapsed, 3),
+            'peak_rss_growth_mib': round((peak_rss_bytes() - baseline) / 2 ** 20, 1)}
+
+
+def run(instance_count, latency, window):
+    results = {}
+    for variant in VARIANTS:
+        command = [sys.executable, '-m', 'benchmarks.bench_streaming_pipeline', '--variant', variant,
+                   '--instances', str(instance_count), '--latency', str(latency), '--window', str(window)]
+        output = subprocess.run(command, check=True, capture_output=True, text=True)
+        results[variant] = json.loads(output.stdout.strip().splitlines()[-1])
+    print(f"{results['streaming']['instances']} instances, page round trip {latency}s, window {window} pages:")
+    for variant, result in results.items():
+        print(f"  {variant:12} first dispatch {result['first_dispatch_seconds']}s, cycle {result['cycle_seconds']}s, "
+              f"peak RSS growth {result['peak_rss_growth_mib']} MiB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--instances', type=int, default=20000)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds of a PractiTest page round trip')
+    parser.add_argument('--window', type=int, default=16, help='Pages fetched ahead of the dispatch')
+    parser.add_argument('--variant', choices=VARIANTS,
+                        help='Run a single variant in this process and print its JSON result')
+    args = parser.parse_args()
+    if args.variant:
+        setup_django()
+        print(json.dumps(run_variant(args.variant, args.instances, args.latency, args.window)))
+    else:
+        run(args.instances, args.latency, args.window)
+
+
+if __name__ == '__main__':
+    main()
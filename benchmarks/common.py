@@ -0,0 +1,80 @@
+import json
+import os
+import resource
+import sys
+import time
+
+import django
+
+
+def setup_django():
+    """
+    Sets up Django with the connector settings, so the connector classes can be imported and used.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'connector.settings')
+    django.setup()
+
+
+def timed(func, *args, **kwargs):
+    """
+    Calls a function and measures its wall time.
+
+    :return: Tuple of (result, elapsed seconds).
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def peak_rss_bytes():
+    """
+    Returns the peak resident set size of the process so far, in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Bytes on macOS, KiB on Linux
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def save_results(name, results, path=None):
+    """
+    Stores benchmark results as JSON, so regressions can be compared run to run, see compare_results.
+
+    :param name: Name of the benchmark, used in the default file name.
+    :param results: JSON serializable dictionary.
+    :param path: File to write, RESULTS_DIR/<name>-<timestamp>.json by default.
+    :return: Path of the file.
+    """
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return path
+
+
+def compare_results(baseline, results, lower_is_better, threshold=0.1):
+    """
+    Prints every metric of two benchmark runs side by side and flags the regressions.
+
+    :param baseline: Results of the reference run, or the path of its JSON file.
+    :param results: Results of the new run.
+    :param lower_is_better: Names of the metrics where a lower value is better, higher is better for the others.
+    :param threshold: Relative change above which a worse metric is reported as a regression.
+    :return: List of the names of the regressed metrics.
+    """
+    if isinstance(baseline, str):
+        with open(baseline) as f:
+            baseline = json.load(f)
+    regressions = []
+    for key, value in results['metrics'].items():
+        before = baseline.get('metrics', {}).get(key)
+        if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+            continue
+        change = (value - before) / before if before else 0.0
+        worse = change > threshold if key in lower_is_better else change < -threshold
+        if worse:
+            regressions.append(key)
+        print(f"  {key:28} {before:>12} -> {value:<12} {change:+.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
@@ -0,0 +1,161 @@
+"""
+Local fake PractiTest API server, serving synthetic test sets and test instances for offline end-to-end runs.
+Point a block at it with practitest_api_url=server.api_url.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SET_PATH = re.compile(r'/api/v2/projects/\d+/sets/(\d+)\.json$')
+
+
+class FakePractiTest:
+    """
+    Threaded HTTP server on 127.0.0.1 answering the PractiTest API calls of a block:
+
+    - GET sets.json?filter-id=F: the test sets of filter F, test set i belongs to filter (i % filters) + 1.
+      Test sets marked as processed are no longer returned, as with a PractiTest filter on the trigger field.
+    - GET instances.json?set-ids=...&page[number]=N: page N of the test instances of the sets, page_size
+      instances per page, with the 'total-pages' metadata.
+    - PUT sets/ID.json: marks the test set as processed.
+
+    Every request is delayed by latency seconds, and counted by kind. Use as a context manager.
+
+    :param set_count: Number of test sets.
+    :param instances_per_set: Number of test instances of every test set.
+    :param page_size: Number of test instances per page.
+    :param filters: Number of filters the test sets are spread over.
+    :param latency: Seconds every request is delayed.
+    :param port: Port to listen on, a free port by default.
+    """
+
+    def __init__(self, set_count=20, instances_per_set=100, page_size=100, filters=1, latency=0.0, port=0):
+        from benchmarks import synthetic
+
+        server = self
+        self.set_count = set_count
+        self.instances_per_set = instances_per_set
+        self.page_size = page_size
+        self.filters = filters
+        self.latency = latency
+        self.calls = {'sets': 0, 'instances': 0, 'put': 0, 'other': 0}
+        self.processed = set()
+        self._test_sets = {set_id: synthetic.make_test_set(set_id) for set_id in range(1, set_count + 1)}
+        self._instances = {}  # Set IDs -> list of test instances, built on first use
+        self._pages = {}  # (set IDs, page) -> encoded page
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path.endswith('/sets.json') and 'filter-id' in query:
+                    server._count('sets')
+                    body = server.sets_body(query['filter-id'][0])
+                elif url.path.endswith('/instances.json') and 'set-ids' in query:
+                    server._count('instances')
+                    body = server.instances_body(query['set-ids'][0], int(query.get('page[number]', ['1'])[0]))
+                else:
+                    server._count('other')
+                    return self._send(404, b'{"errors":[{"title":"Not found"}]}')
+                self._send(200, body)
+
+            def do_PUT(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                match = SET_PATH.search(urlparse(self.path).path)
+                server._count('put')
+                if match is None:
+                    return self._send(404, b'{"errors":[{"title":"Not found"}]}')
+                with server._lock:
+                    server.processed.add(int(match.group(1)))
+                self._send(200, b'{"data":{}}')
+
+            def _send(self, status, body):
+                time.sleep(server.latency)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.api_url = f'http://127.0.0.1:{self.server.server_address[1]}/api/v2'
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def filter_id_list(self):
+        """
+        Comma-separated IDs of every filter, as practitest_trigger_filter_id_list.
+        """
+        return ','.join(str(filter_id) for filter_id in range(1, self.filters + 1))
+
+    def sets_body(self, filter_id):
+        with self._lock:
+            processed = set(self.processed)
+        data = [test_set for set_id, test_set in self._test_sets.items()
+                if set_id % self.filters + 1 == int(filter_id) and set_id not in processed]
+        return json.dumps({'data': data}).encode('utf-8')
+
+    def instances_body(self, set_ids, page):
+        key = (set_ids, page)
+        with self._lock:
+            body = self._pages.get(key)
+        if body is not None:
+            return body
+        instances = self._instances_of(set_ids)
+        total_pages = max(1, -(-len(instances) // self.page_size))
+        data = instances[(page - 1) * self.page_size:page * self.page_size]
+        body = json.dumps({'data': data, 'meta': {'current-page': page, 'total-pages': total_pages,
+                                                  'total-count': len(instances)}}).encode('utf-8')
+        with self._lock:
+            self._pages[key] = body
+        return body
+
+    def _instances_of(self, set_ids):
+        from benchmarks import synthetic
+
+        with self._lock:
+            instances = self._instances.get(set_ids)
+            if instances is None:
+                instances = self._instances[set_ids] = [
+                    synthetic.make_instance(set_id, index, self.instances_per_set)
+                    for set_id in (int(set_id) for set_id in set_ids.split(',')) if set_id in self._test_sets
+                    for index in range(self.instances_per_set)]
+            return instances
+
+    def reset(self):
+        """
+        Makes every test set ready to execute again and resets the call counters.
+        """
+        with self._lock:
+            self.processed.clear()
+            self.calls = dict.fromkeys(self.calls, 0)
+
+    def retrigger(self):
+        """
+        Makes every test set ready to execute again, as if they were all triggered again, keeping the call counters.
+        """
+        with self._lock:
+            self.processed.clear()
+
+    def _count(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
@@ -0,0 +1,50 @@
+"""
+Local HTTP endpoint stand-in, receiving the {"messages": [...]} bodies POSTed by the http dispatch sink.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LocalEndpoint:
+    """
+    Threaded HTTP server on 127.0.0.1 counting the received messages. Use as a context manager.
+
+    :param port: Port to listen on, a free port by default.
+    """
+
+    def __init__(self, port=0):
+        endpoint = self
+        self.received = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                count = len(json.loads(body)['messages'])
+                with endpoint._lock:
+                    endpoint.received += count
+                    endpoint.requests += 1
+                self.send_response(202)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/dispatch'
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
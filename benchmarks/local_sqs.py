@@ -0,0 +1,49 @@
+"""
+In-process stand-in for the SQS client, used to exercise SQSPusher without AWS.
+"""
+import random
+import threading
+import time
+
+from connector.static.core.aws_sqs_pusher import MAX_BATCH_BYTES, MAX_BATCH_MESSAGES
+
+
+class LocalSQSClient:
+    """
+    Implements send_message_batch with the SQS batch limits, a per-call latency and random transient failures
+    of single entries, and keeps the received message bodies per queue.
+
+    :param latency: Seconds every send_message_batch call takes, simulating the round trip to SQS.
+    :param failure_rate: Probability of every entry of a call to be reported as a (retriable) failure.
+    :param seed: Seed of the failure randomness.
+    """
+
+    def __init__(self, latency=0.02, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.queues = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send_message_batch(self, QueueUrl, Entries):
+        if not 0 < len(Entries) <= MAX_BATCH_MESSAGES:
+            raise ValueError(f'Batch of {len(Entries)} entries')
+        if len({entry['Id'] for entry in Entries}) != len(Entries):
+            raise ValueError('Batch entry IDs are not distinct')
+        if sum(len(entry['MessageBody'].encode('utf-8')) for entry in Entries) > MAX_BATCH_BYTES:
+            raise ValueError('Batch payload is too large')
+        time.sleep(self.latency)
+        successful = []
+        failed = []
+        with self._lock:
+            self.calls += 1
+            queue = self.queues.setdefault(QueueUrl, [])
+            for entry in Entries:
+                if self._random.random() < self.failure_rate:
+                    failed.append({'Id': entry['Id'], 'SenderFault': False, 'Code': 'ServiceUnavailable',
+                                   'Message': 'Simulated failure'})
+                else:
+                    queue.append(entry['MessageBody'])
+                    successful.append({'Id': entry['Id'], 'MessageId': str(len(queue))})
+        return {'Successful': successful, 'Failed': failed}
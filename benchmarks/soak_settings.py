@@ -0,0 +1,37 @@
+"""
+Settings of the server started by bench_soak: the connector settings, with the database and the block state cache
+in the work directory of the soak run (SOAK_WORK_DIR), never the ones of the dashboard, the static files served
+without collectstatic, and every warning and error logged to the console, where bench_soak counts the SQLite lock
+errors.
+"""
+import os
+import tempfile
+
+from connector.settings import *  # noqa: F401,F403
+
+SOAK_WORK_DIR = os.environ.get('SOAK_WORK_DIR', os.path.join(tempfile.gettempdir(), 'automation_hub_soak'))
+
+DATABASES = {
+    'default': {**DATABASES['default'], 'NAME': os.path.join(SOAK_WORK_DIR, 'db.sqlite3')},
+}
+
+CACHES = {
+    **CACHES,
+    BLOCK_STATE_CACHE: {**CACHES[BLOCK_STATE_CACHE], 'LOCATION': os.path.join(SOAK_WORK_DIR, 'block_state')},
+}
+
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+LOG_RECORD_PREFIX = 'SOAK-LOG'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'record': {'format': LOG_RECORD_PREFIX + ' %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'record'},
+    },
+    'root': {'handlers': ['console'], 'level': 'WARNING'},
+}
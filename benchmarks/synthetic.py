@@ -0,0 +1,160 @@
+import copy
+from functools import lru_cache
+
+from connector.static.core import static_methods
+
+INITIALIZE_JSON = "connector/static/core/initialize.json"
+OPTIONAL_JSON = "connector/static/core/kms/optional.json"
+RUN_STATUSES = ['NO RUN', 'PASSED', 'FAILED', 'BLOCKED', 'N/A']
+PAGE_SIZE = 100
+
+
+def load_initial_data(filter_id_list='1', **overrides):
+    """
+    Loads initialize.json the same way start_block does, with dummy credentials.
+
+    :param filter_id_list: Comma-separated trigger filter IDs.
+    :param overrides: Extra BasePractiTest arguments.
+    :return: Dictionary of BasePractiTest arguments.
+    """
+    initial_data = copy.deepcopy(_load_json(INITIALIZE_JSON))
+    initial_data.update(pt_username='bench@example.com', pt_token='bench-token', access_key='bench', secret_key='bench',
+                        project_name='kms', practitest_trigger_filter_id_list=filter_id_list)
+    initial_data.update(overrides)
+    return initial_data
+
+
+def load_optional_data():
+    """
+    Loads the KMS optional.json field mapping.
+    """
+    return copy.deepcopy(_load_json(OPTIONAL_JSON))
+
+
+@lru_cache(maxsize=None)
+def _load_json(json_path):
+    return static_methods.load_data_from_json(json_path)
+
+
+def make_test_set(set_id, run_only='ALL'):
+    """
+    Builds a PractiTest test set object holding every field used by initialize.json and optional.json.
+
+    :param set_id: ID of the test set.
+    :param run_only: Value of the "Automation Run Only" custom field.
+    """
+    initial_data = _load_json(INITIALIZE_JSON)
+    optional_data = _load_json(OPTIONAL_JSON)
+    custom_fields = {
+        initial_data['practitest_automation_run_only']: run_only,
+        initial_data['practitest_aws_instance_type']: 't3.large',
+        initial_data['practitest_debug']['testset']: 'no',
+        initial_data['sync_exec']: 'yes',
+        initial_data['practitest_automation_trigger']: initial_data['practitest_automation_trigger_value'],
+        optional_data['environment']: 'qa',
+        optional_data['browser']['testset']: 'pc_firefox',
+        optional_data['update_host_file']: 'no',
+        optional_data['execute_at_night']: 'yes',
+        optional_data['kmsBuild']: '17.1.0',
+        optional_data['playerVersion']: '2.99',
+        optional_data['automation_arguments']: '--retries 2',
+        optional_data['partner']: '1234',
+        optional_data['base_url']: 'https://kms.example.com',
+    }
+    return {
+        'id': str(set_id),
+        'type': 'sets',
+        'attributes': {
+            'project-id': 1328,
+            'display-id': 1000 + set_id,
+            'name': f'Synthetic set {set_id}',
+            'assigned-to-id': 42,
+            'custom-fields': custom_fields,
+        },
+    }
+
+
+def make_instance(set_id, index, instances_per_set):
+    """
+    Builds a PractiTest test instance object of a test set.
+
+    :param set_id: ID of the test set the instance belongs to.
+    :param index: Index of the instance inside its test set.
+    :param instances_per_set: Number of instances per test set, used to build unique instance IDs.
+    """
+    optional_data = _load_json(OPTIONAL_JSON)
+    custom_fields = {}
+    if index % 2:
+        custom_fields = {
+            optional_data['browser']['test']: 'pc_chrome',
+            optional_data['admin_username']: 'admin',
+            optional_data['admin_password']: 'secret',
+            optional_data['login_username']: 'user',
+            optional_data['login_password']: 'secret',
+        }
+    return {
+        'id': str(set_id * instances_per_set + index),
+        'type': 'instances',
+        'attributes': {
+            'project-id': 1328,
+            'set-id': set_id,
+            'test-id': 50000 + index,
+            'test-display-id': 5000 + index,
+            'name': f"Synthetic 'test' #{index} (regression)",
+            'run-status': RUN_STATUSES[index % len(RUN_STATUSES)],
+            'custom-fields': custom_fields,
+        },
+    }
+
+
+def make_instance_page(page, page_count):
+    """
+    Builds the body of a PractiTest instances page of PAGE_SIZE instances, with the attributes the API returns
+    for every instance. The instances of a page belong to the test set with the page number as ID.
+
+    :param page: Page number, starting from 1.
+    :param page_count: Total number of pages.
+    """
+    data = []
+    for index in range(PAGE_SIZE):
+        instance = make_instance(page, index, PAGE_SIZE)
+        instance['attributes'].update({
+            'display-id': f'{page}:{index}',
+            'tester-id': 4242,
+            'priority': None,
+            'version': '1.2.3',
+            'last-run': '2024-01-15T10:31:25+00:00',
+            'last-run-duration': '00:01:42',
+            'planned-execution': None,
+            'created-at': '2023-11-02T08:12:44+00:00',
+            'updated-at': '2024-01-15T10:31:25+00:00',
+        })
+        data.append(instance)
+    return {'data': data, 'links': {'self': f'/instances.json?page[number]={page}'},
+            'meta': {'current-page': page, 'next-page': page + 1 if page < page_count else None,
+                     'prev-page': page - 1 or None, 'total-pages': page_count, 'total-count': page_count * PAGE_SIZE}}
+
+
+def make_dataset(set_count, instances_per_set):
+    """
+    Builds test sets and their test instances.
+
+    :param set_count: Number of test sets.
+    :param instances_per_set: Number of test instances in each test set.
+    :return: Tuple of (list of test sets, list of test instances).
+    """
+    test_sets = [make_test_set(set_id) for set_id in range(1, set_count + 1)]
+    instances = [make_instance(set_id, index, instances_per_set)
+                 for set_id in range(1, set_count + 1) for index in range(instances_per_set)]
+    return test_sets, instances
+
+
+def serve_instances(practitest, instances, page_size=100):
+    """
+    Makes a BasePractiTest instance read its test instance pages from memory instead of PractiTest.
+
+    :param practitest: BasePractiTest instance.
+    :param instances: List of test instances, split into pages of page_size.
+    """
+    practitest.iter_instance_pages = lambda test_set_ids_list: [instances[i:i + page_size]
+                                                                for i in range(0, len(instances), page_size)]
@@ -1,7 +1,8 @@
 """
 ASGI config for connector project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``,
+routing HTTP to Django and WebSockets to the consumers (see connector.routing).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +10,9 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "connector.settings")
+django.setup()
 
-application = get_asgi_application()
+from connector.routing import application  # noqa: E402
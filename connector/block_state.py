@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.cache import caches
+
+BLOCK_STATE_FIELDS = ('status', 'is_running', 'filter_id_list')
+
+
+def get_block_state(block_id):
+    """
+    Returns the control state of a block (status, is_running and filter_id_list) from the block state cache,
+    reading it from the DB, the source of truth, on a cache miss.
+
+    :param block_id: ID of the block.
+    :return: Dictionary of the block control state.
+
+    Raises:
+        Block.DoesNotExist: If the block does not exist.
+    """
+    from .models import Block
+    state = _cache().get(_cache_key(block_id))
+    if state is None:
+        state = Block.objects.values(*BLOCK_STATE_FIELDS).get(pk=block_id)
+        _cache().set(_cache_key(block_id), state)
+    return state
+
+
+def cache_block_state(block):
+    """
+    Stores the control state of a block in the block state cache, to be called after the block is saved.
+
+    :param block: The block object.
+    """
+    _cache().set(_cache_key(block.id), {field: getattr(block, field) for field in BLOCK_STATE_FIELDS})
+
+
+def forget_block_state(block_id):
+    """
+    Removes a block from the block state cache.
+
+    :param block_id: ID of the block.
+    """
+    _cache().delete(_cache_key(block_id))
+
+
+def _cache():
+    return caches[settings.BLOCK_STATE_CACHE]
+
+
+def _cache_key(block_id):
+    return f'block_state:{block_id}'
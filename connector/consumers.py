@@ -1,6 +1,7 @@
 # your_app/consumers.py
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
+from connector.events import block_group_name
 
 class ConsoleConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -16,14 +17,14 @@ class LogConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.block_id = self.scope['url_route']['kwargs']['block_id']
         await self.channel_layer.group_add(
-            f"log_{self.block_id}",
+            block_group_name(self.block_id),
             self.channel_name
         )
         await self.accept()
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(
-            f"log_{self.block_id}",
+            block_group_name(self.block_id),
             self.channel_name
         )
 
@@ -32,7 +33,7 @@ class LogConsumer(AsyncWebsocketConsumer):
         message = text_data_json['message']
 
         await self.channel_layer.group_send(
-            f"log_{self.block_id}",
+            block_group_name(self.block_id),
             {
                 'type': 'log_message',
                 'message': message
@@ -44,3 +45,13 @@ class LogConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             'message': message
         }))
+
+    async def log_entries(self, event):
+        await self.send(text_data=json.dumps({
+            'entries': event['entries']
+        }))
+
+    async def block_status(self, event):
+        await self.send(text_data=json.dumps({
+            'status': event['status']
+        }))
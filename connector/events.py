@@ -0,0 +1,52 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+PUBLISH_RETRY_DELAY = 30  # Seconds to skip publishing after the channel layer failed
+_publish_disabled_until = 0
+
+
+def block_group_name(block_id):
+    """
+    Returns the name of the channel group a block's log and status events are published to.
+
+    :param block_id: ID of the block.
+    """
+    return f"log_{block_id}"
+
+
+def publish_log_entries(entries):
+    """
+    Publishes new log entries to the channel group of their block, one event per block.
+
+    :param entries: List of LogEntry objects.
+    """
+    entries_by_block = {}
+    for entry in entries:
+        entries_by_block.setdefault(entry.block_id, []).append({'id': entry.id, 'content': entry.content})
+    for block_id, block_entries in entries_by_block.items():
+        _group_send(block_id, {'type': 'log_entries', 'entries': block_entries})
+
+
+def publish_block_status(block_id, status):
+    """
+    Publishes a block status change to the channel group of the block.
+
+    :param block_id: ID of the block.
+    :param status: The new status of the block.
+    """
+    _group_send(block_id, {'type': 'block_status', 'status': status})
+
+
+def _group_send(block_id, event):
+    # Live updates are best effort, the dashboard falls back to polling when they are not delivered
+    global _publish_disabled_until
+    if time.monotonic() < _publish_disabled_until:
+        return
+    try:
+        channel_layer = get_channel_layer()
+        if channel_layer is not None:
+            async_to_sync(channel_layer.group_send)(block_group_name(block_id), event)
+    except Exception:
+        _publish_disabled_until = time.monotonic() + PUBLISH_RETRY_DELAY
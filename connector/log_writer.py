@@ -0,0 +1,128 @@
+import atexit
+import datetime
+import threading
+from collections import deque
+
+from django import db
+from django.conf import settings
+
+from .events import publish_log_entries
+
+
+class BufferedLogWriter:
+    """
+    Buffered sink for block log messages.
+
+    Messages are accepted without touching the DB and written by a background thread in batches, when
+    batch_size messages are pending or every flush_interval seconds, with a single bulk_create keyed by block_id.
+    Written entries are then published to the channel group of their block.
+
+    :param batch_size: Number of pending messages that triggers a write.
+    :param flush_interval: Maximum number of seconds a message waits before being written.
+    :param max_pending: Maximum number of messages kept while the DB is unavailable, the oldest are dropped first.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=1.0, max_pending=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def write(self, block_id, message):
+        """
+        Queues a log message of a block.
+
+        :param block_id: ID of the block.
+        :param message: The message to be logged.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append((block_id, f"[{datetime.datetime.now()}] {message}"))
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+
+    def flush(self):
+        """
+        Writes every pending message now, in the calling thread.
+
+        :return: Number of messages written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self._pending)
+                self._pending.clear()
+            if not entries:
+                return 0
+            try:
+                log_entries = self._write_entries(entries)
+            except db.Error:
+                self.failed_flushes += 1
+                with self._lock:
+                    self._pending.extendleft(reversed(entries))
+                    while len(self._pending) > self.max_pending:
+                        self._pending.popleft()
+                        self.dropped += 1
+                return 0
+            self.written += len(log_entries)
+            publish_log_entries(log_entries)
+            return len(log_entries)
+
+    def stats(self):
+        """
+        Returns the writer counters as a dictionary.
+        """
+        with self._lock:
+            pending = len(self._pending)
+        return {'pending': pending, 'written': self.written, 'dropped': self.dropped,
+                'failed_flushes': self.failed_flushes}
+
+    def _write_entries(self, entries):
+        from .models import Block, LogEntry
+        try:
+            return LogEntry.objects.bulk_create([LogEntry(block_id=block_id, content=content) for block_id, content in entries])
+        except db.IntegrityError:
+            # Some blocks were deleted while their messages were pending, drop those messages
+            existing = set(Block.objects.filter(id__in={block_id for block_id, _ in entries}).values_list('id', flat=True))
+            kept = [(block_id, content) for block_id, content in entries if block_id in existing]
+            self.dropped += len(entries) - len(kept)
+            return LogEntry.objects.bulk_create([LogEntry(block_id=block_id, content=content) for block_id, content in kept])
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.failed_flushes += 1
+            finally:
+                db.close_old_connections()
+
+
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+
+def get_log_writer():
+    """
+    Returns the process wide BufferedLogWriter, creating it on first use.
+    """
+    global _log_writer
+    with _log_writer_lock:
+        if _log_writer is None:
+            _log_writer = BufferedLogWriter(batch_size=settings.LOG_WRITER_BATCH_SIZE,
+                                            flush_interval=settings.LOG_WRITER_FLUSH_INTERVAL)
+            atexit.register(_log_writer.flush)
+        return _log_writer
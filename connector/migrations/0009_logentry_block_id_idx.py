@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("connector", "0008_remove_block_output_data"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="logentry",
+            index=models.Index(fields=["block", "id"], name="log_entry_block_id_idx"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-18 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("connector", "0009_logentry_block_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="block",
+            name="dispatch_sink",
+            field=models.CharField(default="json", max_length=32),
+        ),
+        migrations.AddField(
+            model_name="block",
+            name="dispatch_target",
+            field=models.CharField(blank=True, max_length=1024, null=True),
+        ),
+    ]
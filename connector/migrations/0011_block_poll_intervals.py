@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-18 05:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("connector", "0010_block_dispatch_sink"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="block",
+            name="poll_max_interval",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="block",
+            name="poll_min_interval",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
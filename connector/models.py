@@ -9,9 +9,18 @@ class Block(models.Model):
     aws_access_key = models.CharField(max_length=255, blank=True, null=True)
     aws_secret_key = models.CharField(max_length=255, blank=True, null=True)
     filter_id_list = models.TextField(blank=True, null=True)
+    dispatch_sink = models.CharField(max_length=32, default='json')
+    dispatch_target = models.CharField(max_length=1024, blank=True, null=True)
+    poll_min_interval = models.PositiveIntegerField(blank=True, null=True)
+    poll_max_interval = models.PositiveIntegerField(blank=True, null=True)
     console_output = models.TextField(default="", blank=True)
 
 class LogEntry(models.Model):
     block = models.ForeignKey(Block, on_delete=models.CASCADE, related_name="log_entries")
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['block', 'id'], name='log_entry_block_id_idx'),
+        ]
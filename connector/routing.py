@@ -0,0 +1,15 @@
+from channels.routing import ProtocolTypeRouter, URLRouter
+from django.core.asgi import get_asgi_application
+from django.urls import path
+
+from connector import consumers
+
+websocket_urlpatterns = [
+    path('ws/console/', consumers.ConsoleConsumer.as_asgi()),
+    path('ws/logs/<int:block_id>/', consumers.LogConsumer.as_asgi()),
+]
+
+application = ProtocolTypeRouter({
+    'http': get_asgi_application(),
+    'websocket': URLRouter(websocket_urlpatterns),
+})
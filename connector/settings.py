@@ -46,16 +46,59 @@ INSTALLED_APPS = [
 # Use channels layer as the default backend for django's ASGI interface
 ASGI_APPLICATION = 'connector.routing.application'
 
-# Channels layer settings
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
-        'CONFIG': {
-            "hosts": [('127.0.0.1', 6379)],
+# Channels layer settings, set CHANNEL_LAYER_BACKEND=memory for a single node / offline setup without Redis
+if os.environ.get('CHANNEL_LAYER_BACKEND', 'redis') == 'memory':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                "hosts": [('127.0.0.1', 6379)],
+            },
         },
+    }
+
+# Block supervisor settings, all blocks of a process share one bounded worker pool
+BLOCK_SUPERVISOR_MAX_WORKERS = int(os.environ.get('BLOCK_SUPERVISOR_MAX_WORKERS', 8))
+# Seconds between the cycles of a block that finds work, growing up to BLOCK_POLL_MAX_INTERVAL while the block is idle.
+# An idle block only probes its trigger filters, at intervals growing up to BLOCK_PICKUP_TARGET: the longest a new
+# trigger waits to be picked up. Every interval is spread by +/- BLOCK_POLL_JITTER of itself. Blocks may override both
+# intervals.
+BLOCK_POLL_INTERVAL = int(os.environ.get('BLOCK_POLL_INTERVAL', 10))
+BLOCK_POLL_MAX_INTERVAL = int(os.environ.get('BLOCK_POLL_MAX_INTERVAL', 80))
+BLOCK_PICKUP_TARGET = int(os.environ.get('BLOCK_PICKUP_TARGET', 60))
+BLOCK_POLL_JITTER = float(os.environ.get('BLOCK_POLL_JITTER', 0.1))
+# Seconds a block cycle may spend retrying PractiTest requests before giving up until its next cycle
+BLOCK_CYCLE_DEADLINE = int(os.environ.get('BLOCK_CYCLE_DEADLINE', 300))
+# Seconds a stop request waits for the running cycle of the block to return
+BLOCK_STOP_TIMEOUT = int(os.environ.get('BLOCK_STOP_TIMEOUT', 5))
+
+# Block control state cache, read by the workers and the status views instead of the DB (see connector.block_state).
+# The file based backend lives next to the database, so it is shared by all processes using that database and no other
+# checkout reads it. Set BLOCK_STATE_CACHE_BACKEND=locmem for a single process.
+BLOCK_STATE_CACHE = 'block_state'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    BLOCK_STATE_CACHE: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        if os.environ.get('BLOCK_STATE_CACHE_BACKEND') == 'locmem'
+        else 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'block_state_cache'),
+        'TIMEOUT': 60,
     },
 }
 
+# Block log messages are buffered and written in batches of LOG_WRITER_BATCH_SIZE or every LOG_WRITER_FLUSH_INTERVAL seconds
+LOG_WRITER_BATCH_SIZE = 100
+LOG_WRITER_FLUSH_INTERVAL = 1.0
+
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 
@@ -109,6 +152,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            "timeout": 20,
+        },
     }
 }
 
@@ -1,14 +1,100 @@
+import random
+import threading
+
 import boto3
-import json
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from connector.static.core import cancellation
+from connector.static.core import codec
+from connector.static.core import static_methods
+
+MAX_BATCH_MESSAGES = 10  # SQS allows a batch of max 10 messages
+MAX_BATCH_BYTES = 256 * 1024  # SQS allows a batch payload of max 256 KB
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF = 0.2
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_sqs_client(access_key, secret_key, region_name, max_pool_connections=DEFAULT_MAX_WORKERS):
+    """
+    Returns an SQS client for the given credentials, creating it on first use.
+    boto3 clients are thread safe, so a single client is shared by every push and every batch sender thread.
+
+    :param access_key: AWS access key.
+    :param secret_key: AWS secret key.
+    :param region_name: AWS region of the queue.
+    :param max_pool_connections: Maximum number of connections kept alive by the client.
+    :return: botocore SQS client
+    """
+    key = (access_key, secret_key, region_name, max_pool_connections)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            session = boto3.Session(aws_access_key_id=access_key, aws_secret_access_key=secret_key,
+                                    region_name=region_name)
+            client = _clients[key] = session.client('sqs', config=Config(max_pool_connections=max_pool_connections))
+        return client
+
+
+def pack_batches(bodies, max_messages=MAX_BATCH_MESSAGES, max_bytes=MAX_BATCH_BYTES):
+    """
+    Packs encoded message bodies into SQS batches, limited by both the number of messages and the payload size.
+    The Id of every entry is the index of its body, so the entries of all batches can be traced back to their message.
+
+    :param bodies: List of encoded message bodies.
+    :param max_messages: Maximum number of messages in a batch.
+    :param max_bytes: Maximum total size of the message bodies of a batch, in bytes.
+    :return: Tuple of (batches, each a list of SendMessageBatch entries, and the Failed entries of the bodies
+        larger than max_bytes, which SQS would reject).
+    """
+    batches = []
+    oversized = []
+    batch = []
+    batch_bytes = 0
+    for index, body in enumerate(bodies):
+        size = len(body.encode('utf-8'))
+        if size > max_bytes:
+            oversized.append({'Id': str(index), 'SenderFault': True, 'Code': 'MessageTooLong',
+                              'Message': f'SQS message of {size} bytes exceeds the {max_bytes} bytes limit'})
+            continue
+        if len(batch) == max_messages or batch_bytes + size > max_bytes:
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+        batch.append({'Id': str(index), 'MessageBody': body})
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches, oversized
+
 
 class SQSPusher:
-    def __init__(self, access_key, secret_key, region_name='us-west-2'):
-        self.session = boto3.Session(
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            region_name=region_name
-        )
-        self.sqs = self.session.resource('sqs')
+    """
+    Pushes messages to an SQS queue.
+
+    Messages are packed into batches by count and payload size, the batches are sent concurrently and the
+    entries SQS reports as failed (or whole batches failing with a transient error) are retried with exponential
+    backoff. Entries failing with a sender fault are not retried, they are returned in the Failed list.
+
+    :param access_key: AWS access key.
+    :param secret_key: AWS secret key.
+    :param region_name: AWS region of the queue.
+    :param client: SQS client to use, by default a client shared by every pusher with the same credentials.
+    :param max_workers: Maximum number of batches sent at the same time.
+    :param max_attempts: Maximum number of attempts of a batch.
+    :param backoff: Seconds to wait before the first retry, doubled on every retry.
+    """
+
+    def __init__(self, access_key, secret_key, region_name='us-west-2', client=None, max_workers=DEFAULT_MAX_WORKERS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF):
+        self.sqs = client or get_sqs_client(access_key, secret_key, region_name, max_pool_connections=max_workers)
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
 
     def push_to_queue(self, queue_url, messages):
         """
@@ -16,23 +102,48 @@ class SQSPusher:
 
         :param queue_url: URL of the SQS queue.
         :param messages: A single dictionary or a list of dictionaries to be sent as messages.
-        :return: List of responses from SQS.
+        :return: List of responses from SQS, one per batch, with the Successful and the finally Failed entries,
+            the Id of an entry being the index of its message. Messages too large for SQS are not sent, they are
+            returned as Failed entries of an extra response.
         """
-        queue = self.sqs.Queue(queue_url)
-
         # Ensure messages is a list even if a single message is provided
         if not isinstance(messages, list):
             messages = [messages]
 
-        responses = []
+        batches, oversized = pack_batches([codec.dumps(msg) for msg in messages])
+        responses = static_methods.concurrent_map(lambda batch: self._send_batch(queue_url, batch), batches,
+                                                  self.max_workers)
+        if oversized:
+            responses.append({'Successful': [], 'Failed': oversized})
+        return responses
 
-        for i in range(0, len(messages), 10):  # SQS allows a batch of max 10 messages
-            batch = messages[i:i + 10]
-            entries = [{'Id': str(j), 'MessageBody': json.dumps(msg)} for j, msg in enumerate(batch)]
-            response = queue.send_messages(Entries=entries)
-            responses.append(response)
+    def _send_batch(self, queue_url, entries):
+        successful = []
+        failed = []
+        attempt = 0
+        while entries:
+            attempt += 1
+            try:
+                response = self.sqs.send_message_batch(QueueUrl=queue_url, Entries=entries)
+            except (BotoCoreError, ClientError) as e:
+                if attempt >= self.max_attempts:
+                    failed.extend({'Id': entry['Id'], 'SenderFault': False, 'Code': type(e).__name__,
+                                   'Message': str(e)} for entry in entries)
+                    break
+            else:
+                successful.extend(response.get('Successful', []))
+                retry_ids = set()
+                for failure in response.get('Failed', []):
+                    if failure.get('SenderFault') or attempt >= self.max_attempts:
+                        failed.append(failure)
+                    else:
+                        retry_ids.add(failure['Id'])
+                entries = [entry for entry in entries if entry['Id'] in retry_ids]
+                if not entries:
+                    break
+            cancellation.interruptible_sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        return {'Successful': successful, 'Failed': failed}
 
-        return responses
 
 # Usage
 # pusher = SQSPusher('YOUR_ACCESS_KEY', 'YOUR_SECRET_KEY')
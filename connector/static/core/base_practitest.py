@@ -1,14 +1,27 @@
-import datetime
+import os
 import time
 from enum import Enum
-import json
+from connector.static.core import codec
 from connector.static.core import static_methods
-from connector.static.core.aws_sqs_pusher import SQSPusher
+from connector.static.core.dispatch_record import BASE_FIELDS, as_message, get_record_type
+from connector.static.core.dispatch_sinks import DEFAULT_SINK, DispatchResult, create_sink
+from connector.static.core.rate_limiter import account_key, get_shared_rate_limiter
+from connector.static.core.field_resolver import FieldSpec, REQUIRED, compile_field_plan
 
+DEFAULT_API_URL = os.environ.get('PRACTITEST_API_URL', 'https://api.practitest.com/api/v2')
+DEFAULT_PAGE_WINDOW = int(os.environ.get('PRACTITEST_PAGE_WINDOW', 16))
 
 class BasePractiTest:
     WAIT_EXPONENTIAL_MULTIPLIER = 10000
     WAIT_EXPONENTIAL_MAX = 60000
+    PAGE_SIZE = 100  # PractiTest returns up to 100 items per page
+    PARALLEL_PAGINATION = True
+    PAGE_FETCH_CONCURRENCY = 8
+    PAGE_WINDOW = DEFAULT_PAGE_WINDOW  # Pages fetched ahead of the dispatch, bounds the pages held in memory
+    DISPATCH_BATCH_SIZE = 1000  # Tests per send of a streamed dispatch, see dispatch_test_stream
+    MAX_LOGGED_FAILURES = 20  # Rejected tests logged one by one per dispatch, see dispatch_test_stream
+    FILTER_FETCH_CONCURRENCY = 8
+    WRITE_BACK_CONCURRENCY = 8
     """
     Initializes the BasePractiTest class with various configurations and settings.
 
@@ -29,6 +42,14 @@ class BasePractiTest:
     :param practitest_debug: Debug flag, when True, the spot will no be terminated.
     :param execution_type: Type of execution to be performed.
     :param sync_exec: Flag to determine if execution should be synchronous.
+    :param dispatch_sink: Kind of sink the tests to execute are dispatched to, see dispatch_sinks.create_sink.
+    :param dispatch_target: Queue URL, directory, file path, queue name or endpoint URL of the dispatch sink.
+    :param sqs_region: AWS region of the SQS queue, for the sqs dispatch sink.
+    :param practitest_rate_limit: Requests per minute allowed for the PractiTest account of the API token, or a
+        {'requests_per_minute', 'burst'} dictionary. Shared by every block of the account on the host. If None,
+        the PRACTITEST_RATE_LIMIT environment variable, or no limit but the 429 responses of the server.
+    :param practitest_api_url: Base URL of the PractiTest API, e.g. of a local fake server for offline runs.
+        DEFAULT_API_URL (the PRACTITEST_API_URL environment variable, or the PractiTest API) if None.
     :param block: Block parameter (purpose to be defined based on code context).
     :param block_id: ID for the block.
     """
@@ -50,6 +71,11 @@ class BasePractiTest:
                  practitest_debug=None,
                  execution_type=None,
                  sync_exec=None,
+                 dispatch_sink=DEFAULT_SINK,
+                 dispatch_target=None,
+                 sqs_region='us-west-2',
+                 practitest_rate_limit=None,
+                 practitest_api_url=None,
                  block=None,
                  block_id=None,
                  ):
@@ -71,13 +97,16 @@ class BasePractiTest:
         self.PRACTITEST_DEBUG = practitest_debug
         self.EXECUTION_TYPE = execution_type
         self.SYNCHRONOUS_EXECUTION = sync_exec
+        self.DISPATCH_SINK = dispatch_sink
+        self.DISPATCH_TARGET = dispatch_target
+        self.SQS_REGION = sqs_region
 
         # Trigger fields
         self.PRACTITEST_AUTOMATION_TRIGGER = practitest_automation_trigger
         self.PRACTITEST_AUTOMATION_TRIGGER_VALUE = practitest_automation_trigger_value
 
         # PractiTest API URLs
-        self.BASE_URL = "https://api.practitest.com/api/v2/projects/" + self.PRACTITEST_PROJECT_ID
+        self.BASE_URL = (practitest_api_url or DEFAULT_API_URL).rstrip('/') + "/projects/" + self.PRACTITEST_PROJECT_ID
         self.RUNS_URI = f'{self.BASE_URL}/runs.json?developer_email={self.PRACTITEST_USER_NAME}&api_token={self.PRACTITEST_API_TOKEN}'
         self.INSTANCE_URI = f'{self.BASE_URL}/instances.json?developer_email={self.PRACTITEST_USER_NAME}&api_token={self.PRACTITEST_API_TOKEN}'
         self.SETS_URI = f'{self.BASE_URL}/sets.json?developer_email={self.PRACTITEST_USER_NAME}&api_token={self.PRACTITEST_API_TOKEN}'
@@ -85,8 +114,18 @@ class BasePractiTest:
         self.CLONE_TEST_SET = f'{self.BASE_URL}/sets/YOUR_SET_ID/clone.json?developer_email={self.PRACTITEST_USER_NAME}&api_token={self.PRACTITEST_API_TOKEN}'
         self.HEADERS = {
             'Content-Type': 'application/json',
-            'Connection': 'close'
         }
+        if practitest_rate_limit:
+            if not isinstance(practitest_rate_limit, dict):
+                practitest_rate_limit = {'requests_per_minute': practitest_rate_limit}
+            get_shared_rate_limiter().configure(account_key(self.INSTANCE_URI),
+                                                requests_per_minute=practitest_rate_limit.get('requests_per_minute'),
+                                                burst=practitest_rate_limit.get('burst'))
+        # Test sets under the trigger filters, fetched once per cycle (an instance lives for a single cycle)
+        self.filter_test_sets_snapshot = None
+        # IDs of the test sets with tests that could not be projected this cycle, they are not marked as processed
+        self.incomplete_test_set_ids = set()
+        self.field_plan = None
 
     class TestStatusEnum(Enum):
         def __str__(self):
@@ -101,30 +140,27 @@ class BasePractiTest:
 
     def log(self, message):
         """
-        Logs the provided message, storing it in the DB
+        Logs the provided message, storing it in the DB through the buffered log writer
         :param message: The message to be logged.
         """
-        from connector.models import Block, LogEntry  # Import the Block and LogEntry models
-        import datetime
-
-        timestamp = datetime.datetime.now()
-        log_with_timestamp = f"[{timestamp}] {message}"
-
         if self.block_id:
-            block = Block.objects.get(pk=self.block_id)  # Fetch the block using block_id
-            LogEntry.objects.create(block=block, content=log_with_timestamp, timestamp=timestamp)
+            from connector.log_writer import get_log_writer
+            get_log_writer().write(self.block_id, message)
 
 
     def get_dict_of_tests_objects(self, filter_test_sets_list):
         """
-        Fetches a list of tests based on their status from the test set labeled as "Automation Run Only"
-        and returns this list along with a list of Practitest test objects.
+        Fetches the tests to execute, based on their status and the "Automation Run Only" property of their test set,
+        and returns them as DispatchRecords holding only the dispatched fields.
+
+        The tests are collected from iter_dispatch_records, every page of test instances is released as soon as
+        its tests are projected, so the raw PractiTest objects are not kept for the rest of the cycle.
 
         Parameters:
         - filter_test_sets (list): A list of test sets to filter from.
 
         Returns:
-        - list: A list of dictionaries where each dictionary represents a test containing:
+        - list: A list of DispatchRecords, see get_record_type, each representing a test containing:
             - project_name (str): Name of the project.
             - test_id (str): Display ID of the test.
             - test_instance (str): Unique ID representing the test instance.
@@ -139,48 +175,116 @@ class BasePractiTest:
             - execution_type (str): Type of execution for the test.
             - sync_exec (bool): Indicates if the execution is synchronous.
 
-        - list: A list of Practitest test objects.
-
         Raises:
         - Exception: If there's an error parsing the test set or test attributes.
 
         Notes:
         - If no test set is found under the specified filter, a warning will be logged.
         """
-        initial_tests_list = [] #Contains all the tests to be executed (pushed to queue)
+        if not filter_test_sets_list:
+            self.log(f'Warning: No test set found under {self.PRACTITEST_TRIGGER_FILTER_ID_LIST} filter, but should be found')
+            return
+        tests = [] #Contains all the tests to be executed (pushed to queue)
+        for page_records in self.iter_dispatch_records(filter_test_sets_list):
+            tests.extend(page_records)
+        return tests
+
+    def iter_dispatch_records(self, filter_test_sets_list):
+        """
+        Streams the tests to execute, page by page: every page of test instances is filtered by the status and the
+        "Automation Run Only" property of its test sets and projected into DispatchRecords as soon as it arrives,
+        then released. Pages are fetched ahead of the consumer, up to PAGE_WINDOW pages.
+
+        Every test is built in a single pass, base fields first and then the initialize.json and application
+        specific fields resolved by the compiled field plan. A test instance found on several pages is yielded once.
+        A test that cannot be parsed is logged and skipped, and its test set is added to incomplete_test_set_ids.
+
+        :param filter_test_sets_list: A list of test sets to filter from.
+        :return: Generator of lists of DispatchRecords, one list per page, see get_dict_of_tests_objects.
+        """
         if not filter_test_sets_list:
             self.log(f'Warning: No test set found under {self.PRACTITEST_TRIGGER_FILTER_ID_LIST} filter, but should be found')
             return
 
         filter_test_sets_dict = self.convert_test_set_obj_list_to_dict_set_id_as_key(filter_test_sets_list)
-        tests = self.get_list_of_tests_by_status(filter_test_sets_dict)
-        try:
-            for test in tests:
-                test_set = filter_test_sets_dict[str(test['attributes']['set-id'])]
-                test_set_attributes = test_set['attributes']
-                test_set_custom_fields = test_set_attributes['custom-fields']
-                test_dict = {}
-                test_attributes = test['attributes']
-                test_custom_fields = test['attributes']['custom-fields']
-                test_dict['project_name'] = self.PROJECT_NAME
-                test_dict['test_id'] = str(test_attributes['test-display-id'])
-                test_dict['test_instance'] = str(test['id']) #Unique test instance id, reporting back to PractiTest
-                test_dict['test_name'] = str(test_attributes['name']).replace("'", "").replace('"', '').replace(',', '')\
-                    .replace('(', '').replace(')', '').replace('<', '').replace('>', '').replace('!', '').replace('@', '')\
-                    .replace('#', '').replace('*', '')
-                test_dict['test_set_id'] = str(test_set_attributes['display-id'])
-                test_dict['test_set_name'] = str(test_set_attributes['name'])
-                test_dict['project_pt_id'] = str(test_attributes['project-id'])
-                test_dict['execution_session_id'] = str(time.time()).replace(".","") #Timestamp for current execution, relevant for sync execution
-                test_dict['automation_run_only'] = str(test_set_custom_fields[self.PRACTITEST_AUTOMATION_RUN_ONLY])
-                test_dict['aws_instance_type'] = str(test_set_custom_fields[self.PRACTITEST_AWS_INSTANCE_TYPE])
-                test_dict['debug'] = self.get_prioritized_value(self.PRACTITEST_DEBUG, test_set, test, is_boolean=True)
-                test_dict['execution_type'] = str(self.EXECUTION_TYPE)
-                test_dict['sync_exec'] = static_methods.try_to_get_from_dict(test_set_custom_fields, self.SYNCHRONOUS_EXECUTION, is_boolean=True)
-                initial_tests_list.append(test_dict)
-        except:
-            self.log(f'Error: failed to parse test set/ test attributes')
-        return initial_tests_list, tests
+        field_plan = self.get_field_plan()
+        record_type = self.get_record_type()
+        dispatched_instance_ids = set()
+        for page_data in self.iter_instance_pages(list(filter_test_sets_dict.keys())):
+            page_records = []
+            try:
+                page_tests = self.get_page_tests_by_status(page_data, filter_test_sets_dict)
+            except Exception as e:
+                self.log(f'Error: failed to filter a page of test instances by status: {e}')
+                self.incomplete_test_set_ids.update(filter_test_sets_dict)
+                page_tests = []
+            for test in page_tests:
+                try:
+                    test_set = filter_test_sets_dict[str(test['attributes']['set-id'])]
+                    test_set_attributes = test_set['attributes']
+                    test_attributes = test['attributes']
+                    test_instance = str(test['id']) #Unique test instance id, reporting back to PractiTest
+                    if test_instance in dispatched_instance_ids:
+                        continue
+                    page_records.append(record_type(
+                        self.PROJECT_NAME,
+                        str(test_attributes['test-display-id']),
+                        test_instance,
+                        str(test_attributes['name']).replace("'", "").replace('"', '').replace(',', '')
+                        .replace('(', '').replace(')', '').replace('<', '').replace('>', '').replace('!', '')
+                        .replace('@', '').replace('#', '').replace('*', ''),
+                        str(test_set_attributes['display-id']),
+                        str(test_set_attributes['name']),
+                        str(test_attributes['project-id']),
+                        str(time.time()).replace(".",""), #Timestamp for current execution, relevant for sync execution
+                        *field_plan.resolve_values(test, test_set))) #initialize.json and optional.json fields
+                    dispatched_instance_ids.add(test_instance)
+                except Exception as e:
+                    self.log(f"Error: failed to parse test set/ test attributes of test instance {test.get('id')}: {e}")
+                    set_id = str(test.get('attributes', {}).get('set-id'))
+                    # A test of an unknown test set leaves every test set incomplete
+                    self.incomplete_test_set_ids.update([set_id] if set_id in filter_test_sets_dict else filter_test_sets_dict)
+            del page_data  # The page is released once its tests are projected
+            if page_records:
+                yield page_records
+
+    def get_field_specs(self):
+        """
+        Returns the specifications of the test dictionary fields mapped by initialize.json.
+
+        :return: Tuple of FieldSpec.
+        """
+        return (
+            FieldSpec('automation_run_only', self.PRACTITEST_AUTOMATION_RUN_ONLY, default=REQUIRED),
+            FieldSpec('aws_instance_type', self.PRACTITEST_AWS_INSTANCE_TYPE, default=REQUIRED),
+            FieldSpec('debug', self.PRACTITEST_DEBUG, is_boolean=True),
+            FieldSpec('execution_type', None, default=str(self.EXECUTION_TYPE)),
+            FieldSpec('sync_exec', self.SYNCHRONOUS_EXECUTION, is_boolean=True),
+        )
+
+    def get_optional_field_specs(self):
+        """
+        Returns the specifications of application specific test dictionary fields, resolved after the
+        initialize.json fields. Meant to be overridden by subclasses, the base implementation adds nothing.
+
+        :return: Tuple of FieldSpec.
+        """
+        return ()
+
+    def get_field_plan(self):
+        """
+        Returns the compiled plan resolving the initialize.json and application specific fields of a test dictionary.
+        """
+        if self.field_plan is None:
+            self.field_plan = compile_field_plan(self.get_field_specs() + self.get_optional_field_specs())
+        return self.field_plan
+
+    def get_record_type(self):
+        """
+        Returns the DispatchRecord type of the tests of the block: the base fields followed by the field plan keys.
+        Plans with keys that cannot be record fields get dictionary messages instead, see get_record_type.
+        """
+        return get_record_type(BASE_FIELDS + self.get_field_plan().keys)
 
 
     def get_prioritized_value(self, dict_value, test_set, test, is_boolean=False):
@@ -229,13 +333,13 @@ class BasePractiTest:
             # Check for 'test' key
             if 'test' in dict_value:
                 return str(extract_value(dict_value['test'], test_attributes, test_custom_fields))
-        except:
+        except Exception:
             pass
         try:
             # Check for 'testset' key
             if 'testset' in dict_value:
                 return str(extract_value(dict_value['testset'], test_set_attributes, test_set_custom_fields))
-        except:
+        except Exception:
             pass
 
         # Check for 'default' key
@@ -265,45 +369,89 @@ class BasePractiTest:
                 val = test_set_obj['attributes'][test_set_property]
             if not val:
                 self.log(f'Failed to get test set property: "{is_custom_fields}", is custom field: "{str(is_custom_fields)}"')
-        except:
+        except Exception:
             self.log('Failed to get test set property')
 
 
-    def get_list_of_tests_by_status(self, test_set_obj_dict):
+    def get_page_tests_by_status(self, page_data, test_set_obj_dict):
         """
-        Fetches a list of tests based on their status and the Automation Run Only property of the associated test set.
+        Filters a page of test instances by their status and the Automation Run Only property of their test set.
 
+        :param page_data: List of test instances of a page, see get_list_of_instance_pages.
         :param test_set_obj_dict: Dictionary of test set objects with set IDs as keys.
-        :return: A list of test instances filtered by the Automation Run Only property of their associated test set.
+        :return: The test instances of the page matching the Automation Run Only property of their test set.
+        """
+        tests_to_execute = []
+        for test_instance in page_data:
+            test_instance_atrr = test_instance['attributes']
+            # If status is 'ALL', will add the test with any status
+            test_set_automation_run_only = test_set_obj_dict[str(test_instance['attributes']['set-id'])]['attributes']['custom-fields'][self.PRACTITEST_AUTOMATION_RUN_ONLY].lower()
+            if test_set_automation_run_only == 'all':
+                tests_to_execute.append(test_instance)
+            # Get only if the test matches to given status
+            elif test_instance_atrr['run-status'].lower() == test_set_automation_run_only:
+                tests_to_execute.append(test_instance)
+        return tests_to_execute
 
-        Note:
-            The method utilizes pagination to fetch tests in batches. Each batch (or page) consists of up to 100 test instances.
-            The function will keep fetching additional pages until a page with fewer than 100 test instances is encountered.
+    def get_list_of_instance_pages(self, test_set_ids_list):
         """
+        Fetches every page of test instances of the given test sets, see iter_instance_pages.
+
+        :param test_set_ids_list: List of test set IDs.
+        :return: A list of pages, each page is the list of test instances it holds, in page order.
+        """
+        return list(self.iter_instance_pages(test_set_ids_list))
+
+    def iter_instance_pages(self, test_set_ids_list):
+        """
+        Streams the pages of test instances of the given test sets, in page order.
+
+        The first page is fetched alone. When PARALLEL_PAGINATION is set and the response holds the
+        'total-pages' metadata, the remaining pages are fetched concurrently, up to PAGE_FETCH_CONCURRENCY
+        requests at a time and at most PAGE_WINDOW pages ahead of the consumer, starting before the first page is
+        yielded so they are fetched while the consumer dispatches it. Otherwise, pages are fetched one by one until
+        a page with fewer than PAGE_SIZE test instances is encountered.
+
+        :param test_set_ids_list: List of test set IDs.
+        :return: Generator of pages, each page is the list of test instances it holds.
+        """
+        url = self.INSTANCE_URI + "&set-ids=" + ','.join(test_set_ids_list)
+        first_page = self.get_instances_page(url, 1)
+        total_pages = first_page.get("meta", {}).get("total-pages")
+        page_data = first_page["data"]
+        del first_page
+
+        if self.PARALLEL_PAGINATION and total_pages is not None:
+            next_pages = static_methods.concurrent_imap(lambda page: self.get_instances_page(url, page)["data"],
+                                                        range(2, int(total_pages) + 1),
+                                                        self.PAGE_FETCH_CONCURRENCY, self.PAGE_WINDOW)
+            try:
+                yield page_data
+                del page_data
+                yield from next_pages
+            finally:
+                next_pages.close()
+            return
+
+        yield page_data
 
-        test_set_ids_list = list(test_set_obj_dict.keys())
-        test_set_ids_list_str = ','.join(test_set_ids_list)
-        tests_to_execute = []
         page = 1
-        while True:
-            url = self.INSTANCE_URI + "&set-ids=" + test_set_ids_list_str + "&page[number]=" + str(page)
-            # For next iteration
+        while len(page_data) >= self.PAGE_SIZE:
             page = page + 1
-            response = static_methods.wait_for_request_200('get', url, self.HEADERS, msg_on_retry=f'Bad response for get_list_of_tests_by_status; Going to retry')
-            dct_sets = json.loads(response.text)
-            if len(dct_sets["data"]) > 0:
-                for test_instance in dct_sets["data"]:
-                    test_instance_atrr = test_instance['attributes']
-                    # If status is 'ALL', will add the test with any status
-                    test_set_automation_run_only = test_set_obj_dict[str(test_instance['attributes']['set-id'])]['attributes']['custom-fields'][self.PRACTITEST_AUTOMATION_RUN_ONLY].lower()
-                    if test_set_automation_run_only == 'all':
-                        tests_to_execute.append(test_instance)
-                    # Get only if the test matches to given status
-                    elif test_instance_atrr['run-status'].lower() == test_set_automation_run_only:
-                        tests_to_execute.append(test_instance)
-            if len(dct_sets["data"]) < 100:
-                break #Every page is 100 items, no need to get next page
-        return tests_to_execute
+            page_data = self.get_instances_page(url, page)["data"]
+            yield page_data
+
+    def get_instances_page(self, url, page):
+        """
+        Fetches a single page of test instances.
+
+        :param url: Instances URL, including the set IDs.
+        :param page: Page number, starting from 1.
+        :return: Dictionary holding the page "data" and "meta".
+        """
+        # Pages are large and fetched once per cycle, they are only coalesced while in flight, never cached
+        content = static_methods.get_content_200(url + "&page[number]=" + str(page), self.HEADERS, msg_on_retry=f'Bad response for get_instances_page; Going to retry')
+        return codec.loads(content)
 
     def convert_test_set_obj_list_to_dict_set_id_as_key(self, test_sets_list):
         """
@@ -329,13 +477,20 @@ class BasePractiTest:
     def get_all_testsets_under_filter_id_list(self, filter_id_list):
         """
         Retrieves all test sets that fall under a given list of filters.
+
+        The filters are fetched concurrently, up to FILTER_FETCH_CONCURRENCY requests at a time, and a test set
+        found under several filters is returned only once.
         :param filter_id_list: List of filter IDs.
         :return: A list of test sets under the specified filters.
         """
-        testsets_list_of_dict = []
-        for filter_id in filter_id_list:
-            testsets_list_of_dict = testsets_list_of_dict + self.get_all_testsets_under_specific_filter_id(filter_id)
-        return testsets_list_of_dict
+        filter_id_list = [str(filter_id).strip() for filter_id in filter_id_list if str(filter_id).strip()]
+        filters_test_sets = static_methods.concurrent_map(self.get_all_testsets_under_specific_filter_id,
+                                                          filter_id_list, self.FILTER_FETCH_CONCURRENCY)
+        test_sets_by_id = {}
+        for test_sets in filters_test_sets:
+            for test_set in test_sets or []:
+                test_sets_by_id.setdefault(test_set['id'], test_set)
+        return list(test_sets_by_id.values())
 
     def get_all_testsets_under_specific_filter_id(self, filter_id):
         """Return all test sets under specific filter id
@@ -349,26 +504,36 @@ class BasePractiTest:
 
         url = self.SETS_URI + "&filter-id=" + str(filter_id)
         try:
-            response = static_methods.wait_for_request_200('get', url, self.HEADERS,
-                                                 f'Bad response for get_all_testsets_under_specific_filter_id; Going to retry')
+            # Filters are polled by many blocks and their probes, their small responses are cached for a few seconds
+            content = static_methods.get_content_200(url, self.HEADERS,
+                                                     f'Bad response for get_all_testsets_under_specific_filter_id; Going to retry',
+                                                     cache=True)
         except Exception as e:
             self.log(f"Error occurred: {e}")
-            raise Exception
-        return static_methods.get_dict_data_if_not_empty(json.loads(response.text))
+            raise
+        return static_methods.get_dict_data_if_not_empty(codec.loads(content))
 
     def get_count_of_test_sets_under_filter(self, filter_id):#TODO add case: return only filters where there something to execute
         """
         Calculates the count of test sets under a given filter or list of filters.
 
         :param filter_id: Comma-separated string of filter IDs.
-        :return: Total count of test sets under the provided filter(s).
+        :return: Total count of distinct test sets under the provided filter(s).
         """
+        return len(self.get_all_testsets_under_filter_list(filter_id))
 
-        filter_id_list = filter_id.split(',')
-        count = 0
-        for filter_id in filter_id_list:
-            count = count + static_methods.safe_len(self.get_all_testsets_under_specific_filter_id(filter_id))
-        return count
+    def get_filter_test_sets_snapshot(self, refresh=False):
+        """
+        Returns the test sets under the trigger filter ID list, fetched once per cycle.
+
+        The trigger check and the execution share this snapshot, so every filter is fetched only once per cycle.
+
+        :param refresh: If True, the test sets are fetched again even if a snapshot exists.
+        :return: A list of test sets under the trigger filters.
+        """
+        if self.filter_test_sets_snapshot is None or refresh:
+            self.filter_test_sets_snapshot = self.get_all_testsets_under_filter_list(self.PRACTITEST_TRIGGER_FILTER_ID_LIST)
+        return self.filter_test_sets_snapshot
 
     def is_to_trigger(self):
         """
@@ -376,27 +541,114 @@ class BasePractiTest:
 
         :return: True if there are test sets to be executed, otherwise False.
         """
-        test_set_count = self.get_count_of_test_sets_under_filter(self.PRACTITEST_TRIGGER_FILTER_ID_LIST)
+        test_set_count = len(self.get_filter_test_sets_snapshot())
         if test_set_count > 0:
             self.log(f"{test_set_count} Testset/s found to execute")
             return True
         else:
             return False
 
-    def push_to_sqs(self, tests_to_execute, debug=True):
+    def mark_test_sets_processed(self, test_sets):
         """
-        Pushes test execution data to an SQS queue or, if in debug mode, writes the data to a JSON file.
+        Sets the processed field of the dispatched test sets to the processed value, so they leave the trigger
+        filter and the next cycles do not dispatch them again.
 
-        :param tests_to_execute: Dictionary containing details of tests to be executed.
-        :param debug: Boolean indicating if the method is in debug mode. If True, data is written to a JSON file instead of SQS. Default is True.
+        The test sets are updated with one PUT each, up to WRITE_BACK_CONCURRENCY requests at a time, all sharing
+        the same payload.
+
+        :param test_sets: List of test sets to be marked.
+        :return: Number of test sets marked.
         """
-        if debug:
-            timestamp = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
-            filename = f'{timestamp}_to_execute.json'
-            static_methods.write_dict_to_json_file(tests_to_execute, filename)
-            self.log(f'JSON file: "{filename}" created')
-            return
-        self.log('Going to push to SQS')
-        sqs_pusher = SQSPusher(access_key=self.AWS_ACCESS_KEY, secret_key=self.AWS_SECRET_KEY)
-        sqs_pusher.push_to_queue()
-        return
\ No newline at end of file
+        if not self.PROCESSED_FIELD_ID or not test_sets:
+            return 0
+        data = static_methods.create_data_for_test_set_multiple_custom_fields({self.PROCESSED_FIELD_ID: self.PROCESSED_FIELD_VALUE})
+
+        def mark(test_set):
+            url = self.SPECIFIC_SET_URI.replace('YOUR_SET_ID', str(test_set['id']))
+            try:
+                static_methods.wait_for_request_200('put', url, self.HEADERS, msg_on_retry=f'Bad response for mark_test_sets_processed; Going to retry', data=data)
+            except Exception as e:
+                self.log(f"Error: failed to mark test set {test_set['id']} as processed: {e}")
+                return False
+            return True
+
+        marked = sum(static_methods.concurrent_map(mark, test_sets, self.WRITE_BACK_CONCURRENCY))
+        self.log(f'{marked} of {len(test_sets)} Testset/s marked as "{self.PROCESSED_FIELD_VALUE}"')
+        return marked
+
+    def get_completed_test_sets(self, result):
+        """
+        Returns the test sets of the cycle snapshot whose tests were all projected and dispatched, the ones to mark
+        as processed. Test sets in incomplete_test_set_ids or with a test the sink rejected are left under the
+        trigger filter for the next cycle.
+
+        :param result: DispatchResult of the cycle.
+        :return: List of test sets, empty if the sink rejected tests it could not tell apart.
+        """
+        if result.failed > len(result.failures):
+            return []
+        failed_display_ids = {str(as_message(message)['test_set_id']) for message, _ in result.failures}
+        return [test_set for test_set in self.get_filter_test_sets_snapshot()
+                if str(test_set['id']) not in self.incomplete_test_set_ids
+                and str(test_set['attributes']['display-id']) not in failed_display_ids]
+
+    def get_dispatch_sink(self):
+        """
+        Creates the dispatch sink of the block, by default a JSON file per dispatch in the working directory.
+
+        :return: DispatchSink
+        """
+        return create_sink(self.DISPATCH_SINK, self.DISPATCH_TARGET, access_key=self.AWS_ACCESS_KEY,
+                           secret_key=self.AWS_SECRET_KEY, region_name=self.SQS_REGION)
+
+    def dispatch_tests(self, tests_to_execute):
+        """
+        Sends the tests to execute to the dispatch sink of the block.
+
+        :param tests_to_execute: List of DispatchRecords (or dictionaries) of the tests to be executed.
+        :return: DispatchResult
+        """
+        return self.dispatch_test_stream([tests_to_execute])
+
+    def dispatch_test_stream(self, test_batches):
+        """
+        Sends batches of tests to the dispatch sink of the block as they come, e.g. the pages of
+        iter_dispatch_records, so the first tests are dispatched before the last page is fetched.
+
+        The first batch is sent as soon as it arrives, the following ones are grouped up to DISPATCH_BATCH_SIZE
+        tests per send, so small pages do not turn into many small dispatches. If the stream or the sink fails, the
+        sink is aborted instead of closed (e.g. the json sink drops its partial file) and the error is raised.
+
+        :param test_batches: Iterable of lists of DispatchRecords (or dictionaries) of the tests to be executed.
+        :return: DispatchResult of all the batches.
+        """
+        sent = 0
+        failed = 0
+        failures = []
+        pending = []
+        sink = self.get_dispatch_sink()
+        try:
+            for tests_to_execute in test_batches:
+                pending.extend(tests_to_execute)
+                if len(pending) >= self.DISPATCH_BATCH_SIZE or not (sent or failed):
+                    result = sink.send(pending)
+                    sent += result.sent
+                    failed += result.failed
+                    failures.extend(result.failures)
+                    pending = []
+            if pending:
+                result = sink.send(pending)
+                sent += result.sent
+                failed += result.failed
+                failures.extend(result.failures)
+        except BaseException:
+            sink.abort()
+            raise
+        sink.close()
+        for message, reason in failures[:self.MAX_LOGGED_FAILURES]:
+            self.log(f"Error: test instance {as_message(message)['test_instance']} was not dispatched: {reason}")
+        if len(failures) > self.MAX_LOGGED_FAILURES:
+            self.log(f'Error: {len(failures) - self.MAX_LOGGED_FAILURES} more tests were not dispatched')
+        if sent or failed:
+            self.log(f'{sent} tests dispatched to {sink.describe()}, {failed} failed')
+        return DispatchResult(sent, failed, failures)
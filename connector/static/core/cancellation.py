@@ -0,0 +1,64 @@
+import contextvars
+import time
+
+_stop_event = contextvars.ContextVar('stop_event', default=None)
+
+
+class BlockStoppedException(BaseException):
+    """
+    Raised inside a block cycle when the block was asked to stop.
+    Like KeyboardInterrupt, it is not an Exception, so the generic error handling of a cycle lets it through.
+    """
+    pass
+
+
+def set_stop_event(event):
+    """
+    Sets the stop event of the current block cycle. Sleeps and retries of the cycle, including the ones running
+    on worker threads started through static_methods.concurrent_map, are interrupted once the event is set.
+
+    :param event: threading.Event set when the block should stop.
+    :return: Token to pass to reset_stop_event.
+    """
+    return _stop_event.set(event)
+
+
+def reset_stop_event(token):
+    """
+    Restores the stop event that was set before set_stop_event returned the given token.
+
+    :param token: Token returned by set_stop_event.
+    """
+    _stop_event.reset(token)
+
+
+def is_stop_requested():
+    """
+    Returns True if the current block cycle was asked to stop.
+    """
+    event = _stop_event.get()
+    return event is not None and event.is_set()
+
+
+def check_stopped():
+    """
+    Raises BlockStoppedException if the current block cycle was asked to stop.
+    """
+    if is_stop_requested():
+        raise BlockStoppedException('Block stop requested')
+
+
+def interruptible_sleep(seconds):
+    """
+    Sleeps for the given number of seconds, or until the current block cycle is asked to stop.
+
+    :param seconds: Number of seconds to sleep.
+
+    Raises:
+        BlockStoppedException: If the block was asked to stop before or during the sleep.
+    """
+    event = _stop_event.get()
+    if event is None:
+        time.sleep(seconds)
+    elif event.wait(seconds):
+        raise BlockStoppedException('Block stop requested')
@@ -0,0 +1,84 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional accelerated backend, the standard library is used without it
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+DecodeError = json.JSONDecodeError  # orjson.JSONDecodeError is a subclass of it
+
+
+def _default(obj):
+    # Objects with a to_message method, e.g. DispatchRecord, are serialized as their message
+    to_message = getattr(obj, 'to_message', None)
+    if to_message is None:
+        raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+    return to_message()
+
+
+def loads(data):
+    """
+    Parses JSON, directly from bytes such as response.content, without decoding them to text first.
+
+    :param data: JSON document as bytes or str.
+    :return: The parsed object.
+
+    Raises:
+        DecodeError: If the document is not valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj):
+    """
+    Serializes an object to compact UTF-8 encoded JSON.
+
+    :param obj: JSON serializable object.
+    :return: bytes
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default)
+        except TypeError:
+            pass  # e.g. non str keys or integers beyond 64 bits, left to the standard library
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def dumps(obj):
+    """
+    Serializes an object to a compact JSON string, non ASCII characters are kept as is.
+
+    :param obj: JSON serializable object.
+    :return: str
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=_default)
+
+
+def load_file(path):
+    """
+    Parses a JSON file.
+
+    :param path: Path of the file.
+    :return: The parsed object.
+    """
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def dump_file(obj, path):
+    """
+    Writes an object to a file as compact JSON.
+
+    :param obj: JSON serializable object.
+    :param path: Path of the file.
+    """
+    with open(path, 'wb') as f:
+        f.write(dumps_bytes(obj))
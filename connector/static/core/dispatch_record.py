@@ -0,0 +1,84 @@
+import dataclasses
+import keyword
+import threading
+from operator import attrgetter
+
+# Fields every dispatched test starts with, followed by the fields of the block field plan
+BASE_FIELDS = ('project_name', 'test_id', 'test_instance', 'test_name', 'test_set_id', 'test_set_name',
+               'project_pt_id', 'execution_session_id')
+
+
+class DispatchRecord:
+    """
+    Base class of the records of dispatched tests, see get_record_type.
+
+    A record holds only the projected fields of a test, in slots, so the tests of a cycle take a fraction of the
+    memory of dictionaries. Records are dataclasses, serialized natively by the codec (orjson) without building
+    a dictionary first.
+    """
+    __slots__ = ()
+    FIELDS = ()
+    _values = None
+
+    def to_message(self):
+        """
+        Returns the message of the test as a dictionary, in field order. The values are shared, not copied.
+        """
+        return dict(zip(self.FIELDS, self._values(self)))
+
+
+_record_types = {}
+_record_types_lock = threading.Lock()
+
+
+def is_record_field(name):
+    """
+    Returns True if a message key can be a DispatchRecord field: a valid identifier, not a keyword and not hiding
+    an attribute of DispatchRecord.
+
+    :param name: Message key.
+    """
+    return (isinstance(name, str) and name.isidentifier() and not keyword.iskeyword(name)
+            and not hasattr(DispatchRecord, name))
+
+
+def _message_type(fields):
+    # Builds dictionaries instead of records, a repeated key keeps its first position and its last value
+    def make_message(*values):
+        return dict(zip(fields, values))
+    return make_message
+
+
+def get_record_type(fields):
+    """
+    Returns the DispatchRecord subclass with the given fields, creating it on first use, so every block with the
+    same field plan shares one type.
+
+    Fields that cannot be record fields (a repeated key, e.g. a field plan key overriding a base field, or a key
+    that is not an identifier, see is_record_field) fall back to dictionary messages.
+
+    :param fields: Tuple of field names, in message order.
+    :return: DispatchRecord subclass, or a function building dictionaries, called with the field values in order.
+    """
+    fields = tuple(fields)
+    with _record_types_lock:
+        record_type = _record_types.get(fields)
+        if record_type is None and (len(set(fields)) != len(fields) or not all(map(is_record_field, fields))):
+            record_type = _record_types[fields] = _message_type(fields)
+        elif record_type is None:
+            record_type = dataclasses.make_dataclass('DispatchRecord', fields, bases=(DispatchRecord,), slots=True,
+                                                     eq=False)
+            record_type.FIELDS = fields
+            getter = attrgetter(*fields)
+            record_type._values = staticmethod(getter if len(fields) > 1 else lambda record: (getter(record),))
+            _record_types[fields] = record_type
+        return record_type
+
+
+def as_message(message):
+    """
+    Returns a dispatched message as a dictionary, converting a DispatchRecord.
+
+    :param message: DispatchRecord or dictionary.
+    """
+    return message.to_message() if isinstance(message, DispatchRecord) else message
@@ -0,0 +1,260 @@
+import datetime
+import os
+import queue
+import threading
+from collections import namedtuple
+
+from connector.static.core import codec
+from connector.static.core import static_methods
+from connector.static.core.dispatch_record import as_message
+from connector.static.core.aws_sqs_pusher import SQSPusher
+
+DispatchResult = namedtuple('DispatchResult', ['sent', 'failed', 'failures'], defaults=((),))
+DispatchResult.__doc__ = """
+Outcome of a dispatch.
+
+:param sent: Number of messages the sink accepted.
+:param failed: Number of messages the sink rejected.
+:param failures: (message, reason) pairs of the rejected messages the sink can tell apart.
+"""
+
+
+class DispatchSink:
+    """
+    Destination of the tests to execute of a block. Every message is the DispatchRecord, or the dictionary, of
+    one test, records are serialized as their message dictionary.
+    """
+    name = None
+
+    def send(self, messages):
+        """
+        Sends messages to the sink.
+
+        :param messages: List of DispatchRecords or dictionaries.
+        :return: DispatchResult
+        """
+        raise NotImplementedError
+
+    def describe(self):
+        """
+        Returns a short description of the sink for the block log.
+        """
+        return self.name
+
+    def close(self):
+        """
+        Completes the dispatch and releases the resources of the sink.
+        """
+        pass
+
+    def abort(self):
+        """
+        Releases the resources of the sink after a failed dispatch, dropping what it did not deliver yet if it can.
+        The base implementation closes the sink, the messages already sent cannot be recalled.
+        """
+        self.close()
+
+
+class SQSSink(DispatchSink):
+    """
+    Pushes every message to an SQS queue.
+
+    :param queue_url: URL of the SQS queue.
+    :param access_key: AWS access key.
+    :param secret_key: AWS secret key.
+    :param region_name: AWS region of the queue.
+    :param client: SQS client to use instead of the shared boto3 client.
+    """
+    name = 'sqs'
+
+    def __init__(self, queue_url, access_key=None, secret_key=None, region_name='us-west-2', client=None):
+        if not queue_url:
+            raise ValueError('The sqs dispatch sink requires the queue URL as dispatch target')
+        self.queue_url = queue_url
+        self.pusher = SQSPusher(access_key, secret_key, region_name=region_name, client=client)
+
+    def send(self, messages):
+        responses = self.pusher.push_to_queue(self.queue_url, messages)
+        failures = [(messages[int(failure['Id'])], failure.get('Message') or failure.get('Code'))
+                    for response in responses for failure in response['Failed']]
+        return DispatchResult(len(messages) - len(failures), len(failures), failures)
+
+    def describe(self):
+        return f'SQS queue {self.queue_url}'
+
+
+class JsonFileSink(DispatchSink):
+    """
+    Writes every dispatch to a new compact JSON file, named after the dispatch time. The messages of every send
+    are appended to a .part file as they come, renamed to the file name once the sink is closed, so consumers only
+    see complete files. An aborted dispatch deletes its .part file.
+
+    :param directory: Directory the files are written to, the working directory by default.
+    """
+    name = 'json'
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.last_filename = None
+        self._file = None
+        self._empty = True
+
+    def send(self, messages):
+        if self._file is None:
+            filename = f"{datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S-%f')}_to_execute.json"
+            if self.directory:
+                filename = f'{self.directory.rstrip("/")}/{filename}'
+            self._file = open(filename + '.part', 'wb')
+            self._file.write(b'[')
+            self._empty = True
+            self.last_filename = filename
+        items = codec.dumps_bytes(messages)[1:-1]  # The messages of the JSON list, without the brackets
+        if items:
+            self._file.write(items if self._empty else b',' + items)
+            self._empty = False
+        return DispatchResult(len(messages), 0)
+
+    def close(self):
+        if self._file is not None:
+            self._file.write(b']')
+            self._file.close()
+            self._file = None
+            os.replace(self.last_filename + '.part', self.last_filename)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self.last_filename + '.part')
+            self.last_filename = None
+
+    def describe(self):
+        return f'JSON file "{self.last_filename}"' if self.last_filename else f'JSON files in "{self.directory or "."}"'
+
+
+class JsonlFileSink(DispatchSink):
+    """
+    Appends every message as one compact JSON line to a file.
+
+    :param path: Path of the JSONL file.
+    """
+    name = 'jsonl'
+    _locks = {}
+    _locks_lock = threading.Lock()
+
+    def __init__(self, path='to_execute.jsonl'):
+        self.path = path or 'to_execute.jsonl'
+        with self._locks_lock:
+            self._lock = self._locks.setdefault(self.path, threading.Lock())
+
+    def send(self, messages):
+        lines = ''.join(codec.dumps(message) + '\n' for message in messages)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(lines)
+        return DispatchResult(len(messages), 0)
+
+    def describe(self):
+        return f'JSONL file "{self.path}"'
+
+
+_local_queues = {}
+_local_queues_lock = threading.Lock()
+
+
+def get_local_queue(name):
+    """
+    Returns the in-process queue with the given name, creating it on first use.
+
+    :param name: Name of the queue.
+    :return: queue.Queue
+    """
+    with _local_queues_lock:
+        local_queue = _local_queues.get(name)
+        if local_queue is None:
+            local_queue = _local_queues[name] = queue.Queue()
+        return local_queue
+
+
+class InProcessQueueSink(DispatchSink):
+    """
+    Puts every message on a named in-process queue, see get_local_queue.
+
+    :param name: Name of the queue.
+    """
+    name = 'queue'
+
+    def __init__(self, name='default'):
+        self.queue_name = name or 'default'
+        self.queue = get_local_queue(self.queue_name)
+
+    def send(self, messages):
+        for message in messages:
+            self.queue.put(as_message(message))
+        return DispatchResult(len(messages), 0)
+
+    def describe(self):
+        return f'in-process queue "{self.queue_name}"'
+
+
+class HttpSink(DispatchSink):
+    """
+    POSTs the messages as {"messages": [...]} JSON bodies to an HTTP endpoint, batch_size messages per request.
+    Requests go through the shared pooled client and are retried like the PractiTest requests.
+
+    :param url: URL of the endpoint.
+    :param batch_size: Maximum number of messages per request.
+    """
+    name = 'http'
+    HEADERS = {'Content-Type': 'application/json'}
+
+    def __init__(self, url=None, batch_size=100):
+        if not url:
+            raise ValueError('The http dispatch sink requires the endpoint URL as dispatch target')
+        self.url = url
+        self.batch_size = batch_size
+
+    def send(self, messages):
+        sent = 0
+        failures = []
+        for i in range(0, len(messages), self.batch_size):
+            batch = messages[i:i + self.batch_size]
+            r = static_methods.send_request('post', self.url, self.HEADERS,
+                                            codec.dumps({'messages': batch}))
+            if r is not None and 200 <= r.status_code < 300:
+                sent += len(batch)
+            else:
+                reason = f'HTTP {r.status_code}' if r is not None else 'no response'
+                failures.extend((message, reason) for message in batch)
+        return DispatchResult(sent, len(failures), failures)
+
+    def describe(self):
+        return f'HTTP endpoint {self.url}'
+
+
+SINKS = {sink.name: sink for sink in (SQSSink, JsonFileSink, JsonlFileSink, InProcessQueueSink, HttpSink)}
+DEFAULT_SINK = JsonFileSink.name
+
+
+def create_sink(kind, target=None, access_key=None, secret_key=None, region_name='us-west-2'):
+    """
+    Creates the dispatch sink of a block.
+
+    :param kind: One of SINKS: 'sqs', 'json', 'jsonl', 'queue' or 'http'. DEFAULT_SINK if empty.
+    :param target: Queue URL, directory, file path, queue name or endpoint URL, depending on the kind.
+    :param access_key: AWS access key, for the sqs sink.
+    :param secret_key: AWS secret key, for the sqs sink.
+    :param region_name: AWS region, for the sqs sink.
+    :return: DispatchSink
+
+    Raises:
+        ValueError: If the kind is unknown or the target is missing.
+    """
+    kind = kind or DEFAULT_SINK
+    if kind not in SINKS:
+        raise ValueError(f'Unknown dispatch sink: {kind}, expected one of {", ".join(SINKS)}')
+    if kind == SQSSink.name:
+        return SQSSink(target, access_key=access_key, secret_key=secret_key, region_name=region_name)
+    if target:
+        return SINKS[kind](target)
+    return SINKS[kind]()
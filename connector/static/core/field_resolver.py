@@ -0,0 +1,111 @@
+import json
+import threading
+from collections import namedtuple
+
+TEST = 'test'
+TESTSET = 'testset'
+REQUIRED = object()  # Default of fields that must exist, a missing field raises KeyError
+_MISSING = object()
+
+# Containers of a (test, test set) pair, see FieldPlan._containers
+_TEST_ATTRIBUTES, _TEST_CUSTOM_FIELDS, _TESTSET_ATTRIBUTES, _TESTSET_CUSTOM_FIELDS = range(4)
+
+FieldSpec = namedtuple('FieldSpec', ['key', 'mapping', 'source', 'default', 'is_boolean'],
+                       defaults=(None, TESTSET, 'None', False))
+FieldSpec.__doc__ = """
+Describes one output field of a test dictionary.
+
+:param key: Output key. A key repeating a base field overrides it, see dispatch_record.get_record_type.
+:param mapping: PractiTest field name or '---f-' custom field ID, or a prioritized {'test', 'testset', 'default'}
+    dictionary as found in initialize.json / optional.json. None for a constant field holding the default.
+:param source: TEST or TESTSET, where a plain field name is read from.
+:param default: Value used when the field is missing, REQUIRED if a missing field is an error.
+:param is_boolean: If true, 'yes'/'no' values are converted to 'true'/'false' strings.
+"""
+
+
+class FieldPlan:
+    """
+    Compiled field mappings of a test dictionary.
+
+    Every output key maps to a precomputed accessor chain of (container, field) pairs, tried in order, a default
+    and a boolean coercion flag, so resolving an instance does no string checks or exception handling.
+    """
+    __slots__ = ('entries', 'keys')
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.keys = tuple(entry[0] for entry in entries)
+
+    def resolve_values(self, test, test_set):
+        """
+        Resolves every field of the plan for a test instance.
+
+        :param test: The Practitest test instance object.
+        :param test_set: The Practitest test set object the test instance belongs to.
+        :return: List of the field values, in the order of keys.
+        """
+        containers = self._containers(test, test_set)
+        values = []
+        for key, chain, default, is_boolean in self.entries:
+            val = _MISSING
+            for container, field in chain:
+                val = containers[container].get(field, _MISSING)
+                if val is not _MISSING:
+                    break
+            if val is _MISSING:
+                if default is REQUIRED:
+                    raise KeyError(chain[-1][1])
+                values.append(default)
+            elif is_boolean and val == 'yes':
+                values.append('true')
+            elif is_boolean and val == 'no':
+                values.append('false')
+            else:
+                values.append(str(val))
+        return values
+
+    @staticmethod
+    def _containers(test, test_set):
+        test_attributes = test['attributes']
+        test_set_attributes = test_set['attributes']
+        return (test_attributes, test_attributes['custom-fields'] or {},
+                test_set_attributes, test_set_attributes['custom-fields'] or {})
+
+
+def _accessor(field, source):
+    if '---f-' in field:
+        return (_TEST_CUSTOM_FIELDS if source == TEST else _TESTSET_CUSTOM_FIELDS), field
+    return (_TEST_ATTRIBUTES if source == TEST else _TESTSET_ATTRIBUTES), field
+
+
+def _compile_entry(spec):
+    if spec.mapping is None:
+        return spec.key, (), spec.default, spec.is_boolean
+    if isinstance(spec.mapping, dict):
+        # Prioritized value, test -> testset -> default, see BasePractiTest.get_prioritized_value
+        chain = tuple(_accessor(spec.mapping[source], source) for source in (TEST, TESTSET) if source in spec.mapping)
+        default = str(spec.mapping['default']) if 'default' in spec.mapping else REQUIRED
+        return spec.key, chain, default, spec.is_boolean
+    return spec.key, (_accessor(spec.mapping, spec.source),), spec.default, spec.is_boolean
+
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def compile_field_plan(specs):
+    """
+    Compiles field specifications into a FieldPlan. Plans are cached, so every block compiles its mappings once.
+
+    :param specs: Iterable of FieldSpec.
+    :return: FieldPlan
+    """
+    specs = tuple(specs)
+    cache_key = json.dumps([[spec.key, spec.mapping, spec.source, spec.default if spec.default is not REQUIRED else
+                             '<required>', spec.is_boolean] for spec in specs])
+    with _plans_lock:
+        plan = _plans.get(cache_key)
+        if plan is None:
+            plan = _plans[cache_key] = FieldPlan(tuple(_compile_entry(spec) for spec in specs))
+        return plan
@@ -1,6 +1,6 @@
-from time import sleep
 from connector.static.core.base_practitest import BasePractiTest
-from connector.static.core.static_methods import try_to_get_from_dict
+from connector.static.core.dispatch_sinks import DispatchResult
+from connector.static.core.field_resolver import FieldSpec, TEST
 
 class KmsPractiTest(BasePractiTest):
     def __init__(self, more_data=None, block_id=None, *args, **kwargs):
@@ -51,59 +51,63 @@ class KmsPractiTest(BasePractiTest):
     def start_service(self):
         """
         Starts the service by determining if test execution should be triggered.
-        If tests should be triggered, it invokes the execution and then pushes the test data to SQS.
+        If tests should be triggered, it invokes the execution, which streams the test data to the block dispatch
+        sink, then marks as processed the test sets whose tests were all dispatched, see get_completed_test_sets.
+
+        :return: True if test sets were found under the trigger filters, otherwise False.
         """
         if super().is_to_trigger():
-            tests_to_execute = self.trigger_execution()
-            self.push_to_sqs(tests_to_execute)
+            result = self.trigger_execution()
+            if result.sent:
+                self.mark_test_sets_processed(self.get_completed_test_sets(result))
             # self.log('DEBUG: Done')
-            sleep(10)
+            return True
         else:
             self.log(f"no sets found under filter id")
+            return False
 
 
     def trigger_execution(self):
         """
         Attempts to trigger the execution of tests.
 
-        The method fetches test sets based on provided filter IDs, processes each test's attributes, and prepares them for execution.
+        The method uses the test sets snapshot of the current cycle, processes each test's attributes, and dispatches
+        the tests of every page of test instances as soon as it is fetched, see iter_dispatch_records.
 
-        :return: List of tests prepared for execution.
+        :return: DispatchResult of the tests dispatched for execution.
         """
+        result = DispatchResult(0, 0)
         try:
             self.log(f"Execution Triggered")
-            filter_test_sets_list = self.get_all_testsets_under_filter_list(self.PRACTITEST_TRIGGER_FILTER_ID_LIST)
-            filter_test_sets_dict = self.convert_test_set_obj_list_to_dict_set_id_as_key(filter_test_sets_list)
-            initial_tests_list, tests = super().get_dict_of_tests_objects(filter_test_sets_list) #Only initialize.json fields
-            if not initial_tests_list:
+            filter_test_sets_list = self.get_filter_test_sets_snapshot()
+            result = self.dispatch_test_stream(self.iter_dispatch_records(filter_test_sets_list)) #initialize.json and optional.json fields
+            if not result.sent and not result.failed:
                 raise
-            try:
-                for test in tests:
-                    test_set = filter_test_sets_dict[str(test['attributes']['set-id'])]
-                    test_set_attributes = test_set['attributes']
-                    test_set_custom_fields = test_set_attributes['custom-fields']
-                    test_attributes = test['attributes']
-                    test_custom_fields = test['attributes']['custom-fields']
-                    for initial_test in initial_tests_list: #Adding optional.json fields
-                        if str(initial_test['test_id']) == str(test_attributes['test-display-id']):
-                            initial_test['environment'] = try_to_get_from_dict(test_set_custom_fields, self.ENVIRONMENT)
-                            initial_test['browser'] = self.get_prioritized_value(self.BROWSER, test_set, test, is_boolean=True)
-                            initial_test['update_host_file'] = try_to_get_from_dict(test_set_custom_fields, self.UPDATE_HOST_FILE, is_boolean=True)
-                            initial_test['execute_at_night'] = try_to_get_from_dict(test_set_custom_fields, self.EXECUTE_AT_NIGHT, is_boolean=True)
-                            initial_test['verify_versions'] = try_to_get_from_dict(test_set_custom_fields,self.VERIFY_VERSIONS, is_boolean=True)
-                            initial_test['kmsBuild'] = try_to_get_from_dict(test_set_custom_fields, self.KMS_BUILD)
-                            initial_test['playerVersion'] = try_to_get_from_dict(test_set_custom_fields, self.PLAYER_VERSION)
-                            initial_test['assigned_to'] = try_to_get_from_dict(test_set_attributes ,self.ASSIGNED_TO)
-                            initial_test['automation_arguments'] = try_to_get_from_dict(test_set_custom_fields, self.AUTOMATION_ARGUMENTS, default_value='')
-                            initial_test['partner'] = try_to_get_from_dict(test_set_custom_fields, self.PARTNER, default_value='')
-                            initial_test['base_url'] = try_to_get_from_dict(test_set_custom_fields, self.BASE_URL, default_value='')
-                            initial_test['admin_username'] =  try_to_get_from_dict(test_custom_fields, self.ADMIN_USERNAME, default_value='')
-                            initial_test['admin_password'] =  try_to_get_from_dict(test_custom_fields, self.ADMIN_PASSWORD, default_value='')
-                            initial_test['login_username'] =  try_to_get_from_dict(test_custom_fields, self.LOGIN_USERNAME, default_value='')
-                            initial_test['login_password'] =  try_to_get_from_dict(test_custom_fields, self.LOGIN_PASSWORD, default_value='')
-                            initial_test['playerVersionV7'] =  try_to_get_from_dict(test_custom_fields, self.PLAYER_VERSION_V7, default_value='')
-            except:
-                self.log(f'Error: failed to parse test set/ test attributes')
-        except:
+        except Exception:
             self.log(f"Error: failed to trigger execution, skipping this execution")
-        return initial_tests_list
\ No newline at end of file
+        return result
+
+    def get_optional_field_specs(self):
+        """
+        Returns the specifications of the optional.json fields.
+
+        :return: Tuple of FieldSpec.
+        """
+        return (
+            FieldSpec('environment', self.ENVIRONMENT),
+            FieldSpec('browser', self.BROWSER, is_boolean=True),
+            FieldSpec('update_host_file', self.UPDATE_HOST_FILE, is_boolean=True),
+            FieldSpec('execute_at_night', self.EXECUTE_AT_NIGHT, is_boolean=True),
+            FieldSpec('verify_versions', self.VERIFY_VERSIONS, is_boolean=True),
+            FieldSpec('kmsBuild', self.KMS_BUILD),
+            FieldSpec('playerVersion', self.PLAYER_VERSION),
+            FieldSpec('assigned_to', self.ASSIGNED_TO),
+            FieldSpec('automation_arguments', self.AUTOMATION_ARGUMENTS, default=''),
+            FieldSpec('partner', self.PARTNER, default=''),
+            FieldSpec('base_url', self.BASE_URL, default=''),
+            FieldSpec('admin_username', self.ADMIN_USERNAME, source=TEST, default=''),
+            FieldSpec('admin_password', self.ADMIN_PASSWORD, source=TEST, default=''),
+            FieldSpec('login_username', self.LOGIN_USERNAME, source=TEST, default=''),
+            FieldSpec('login_password', self.LOGIN_PASSWORD, source=TEST, default=''),
+            FieldSpec('playerVersionV7', self.PLAYER_VERSION_V7, source=TEST, default=''),
+        )
@@ -0,0 +1,81 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = int(os.environ.get('PRACTITEST_POOL_SIZE', 20))
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+
+
+class PractiTestClient:
+    """
+    Reusable HTTP client for the PractiTest API.
+
+    Requests go through one requests.Session, so TCP/TLS connections are pooled and kept alive between
+    requests instead of paying a new handshake for every page or filter lookup.
+
+    :param pool_size: Maximum number of connections kept alive per host.
+    :param connect_timeout: Seconds to wait for a connection to be established.
+    :param read_timeout: Seconds to wait for the server to send a response.
+    :param verify: Whether to verify the server TLS certificate.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, verify=False):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.verify = verify
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, headers=None, data=None):
+        """
+        Sends a request on one of the pooled connections.
+
+        :param method: 'get', 'post' or 'put' string
+        :param url: URL as string
+        :param headers: Dictionary of request headers
+        :param data: data/json as string if sending 'post' or 'put' request
+        :return: response
+        """
+        return self.session.request(method.upper(), url, headers=headers, data=data or None, timeout=self.timeout)
+
+    def close(self):
+        """
+        Closes every pooled connection.
+        """
+        self.session.close()
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client():
+    """
+    Returns the PractiTestClient shared by all blocks of the process, creating it on first use.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = PractiTestClient()
+        return _shared_client
+
+
+def configure_shared_client(**kwargs):
+    """
+    Replaces the shared PractiTestClient with a new one built from the given arguments.
+
+    :param kwargs: Arguments passed to PractiTestClient, e.g. pool_size.
+    :return: The new shared client.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+        _shared_client = PractiTestClient(**kwargs)
+        return _shared_client
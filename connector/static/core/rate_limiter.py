@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qs, urlparse
+
+from connector.static.core import cancellation
+from connector.static.core import retry_policy
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, the limiter is then shared by the threads of a process only
+    fcntl = None
+
+# No limit by default: the requests of an account are only paused by the 429 responses of the server
+DEFAULT_REQUESTS_PER_MINUTE = float(os.environ.get('PRACTITEST_RATE_LIMIT') or 0) or None
+DEFAULT_BURST = int(os.environ.get('PRACTITEST_RATE_BURST', 10))
+DEFAULT_RETRY_AFTER = 30
+STATE_DIR = os.environ.get('PRACTITEST_RATE_LIMIT_DIR', os.path.join(tempfile.gettempdir(), 'automation_hub_rate_limits'))
+
+
+def account_key(url):
+    """
+    Returns the rate limiting key of a PractiTest API URL: a digest of its API token, or 'default' without one.
+
+    :param url: URL as string
+    """
+    token = parse_qs(urlparse(url).query).get('api_token')
+    if not token:
+        return 'default'
+    return hashlib.sha1(token[0].encode('utf-8')).hexdigest()[:16]
+
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER):
+    """
+    Converts a Retry-After header, in seconds or as an HTTP date, to seconds.
+
+    :param value: Header value, or None.
+    :param default: Seconds returned when the header is missing or invalid.
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter of the PractiTest API, shared by every block worker on the host.
+
+    Each account has a bucket of burst tokens refilled at requests_per_minute. The bucket state lives in a small
+    file per account locked with fcntl, so all processes and threads of the host draw from the same bucket.
+    When the server answers 429, pause empties the bucket until the Retry-After time, so every worker waits
+    for the server hint once instead of retrying on its own. An account without a rate is not limited, its
+    requests only wait for such pauses.
+
+    :param requests_per_minute: Default refill rate of an account, None for no limit.
+    :param burst: Default capacity of the bucket of an account.
+    :param state_dir: Directory of the bucket files.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, burst=DEFAULT_BURST, state_dir=STATE_DIR):
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self.state_dir = state_dir
+        self.waits = 0
+        self.throttled = 0
+        self._limits = {}
+        self._states = {}  # Used without fcntl
+        self._lock = threading.Lock()
+        if fcntl is not None:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def configure(self, account, requests_per_minute=None, burst=None):
+        """
+        Sets the limits of an account.
+
+        :param account: Account key, see account_key.
+        :param requests_per_minute: Refill rate, the default rate (possibly no limit) if None.
+        :param burst: Capacity of the bucket, the default burst if None.
+        """
+        with self._lock:
+            self._limits[account] = (requests_per_minute or self.requests_per_minute, burst or self.burst)
+
+    def acquire(self, account):
+        """
+        Takes a token of an account, waiting until one is available, but never beyond the deadline of the current
+        block cycle.
+
+        :param account: Account key, see account_key.
+        :return: Seconds waited.
+
+        Raises:
+            DeadlineExceededException: When a token would only be available after the deadline of the cycle.
+        """
+        rate, burst = self._get_limits(account)
+        rate_per_second = rate / 60.0 if rate else None
+        waited = 0.0
+        while True:
+            wait = self._update(account, lambda state, now: self._take(state, now, rate_per_second, burst))
+            if wait <= 0:
+                return waited
+            remaining = retry_policy.remaining_time()
+            if remaining is not None and remaining < wait:
+                retry_policy.record_retry(gave_up=True)
+                raise retry_policy.DeadlineExceededException(
+                    f'PractiTest rate limit wait of {wait:.0f}s would end after the cycle deadline')
+            self.waits += 1
+            cancellation.interruptible_sleep(wait)
+            waited += wait
+
+    def pause(self, account, seconds):
+        """
+        Stops every worker from sending requests of an account for the given number of seconds.
+
+        :param account: Account key, see account_key.
+        :param seconds: Seconds to pause, e.g. the Retry-After of a 429 response.
+        """
+        self.throttled += 1
+
+        def apply(state, now):
+            state['paused_until'] = max(state.get('paused_until', 0), now + seconds)
+            state['tokens'] = 0
+            state['updated'] = state['paused_until']
+            return 0
+
+        self._update(account, apply)
+
+    def stats(self):
+        """
+        Returns the limiter counters as a dictionary.
+        """
+        return {'waits': self.waits, 'throttled': self.throttled}
+
+    def _get_limits(self, account):
+        with self._lock:
+            return self._limits.get(account, (self.requests_per_minute, self.burst))
+
+    @staticmethod
+    def _take(state, now, rate_per_second, burst):
+        if now < state.get('paused_until', 0):
+            return state['paused_until'] - now
+        if rate_per_second is None:
+            return 0
+        updated = state.get('updated', now)
+        tokens = min(burst, state.get('tokens', burst) + max(0.0, now - updated) * rate_per_second)
+        state['updated'] = now
+        if tokens >= 1:
+            state['tokens'] = tokens - 1
+            return 0
+        state['tokens'] = tokens
+        return (1 - tokens) / rate_per_second
+
+    def _update(self, account, apply):
+        # Applies a change to the bucket state of an account, atomically for every worker of the host
+        if fcntl is None:
+            with self._lock:
+                return apply(self._states.setdefault(account, {}), time.time())
+        with open(os.path.join(self.state_dir, account), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or '{}')
+                except ValueError:
+                    state = {}
+                result = apply(state, time.time())
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+_shared_rate_limiter = None
+_shared_rate_limiter_lock = threading.Lock()
+
+
+def get_shared_rate_limiter():
+    """
+    Returns the RateLimiter shared by all blocks of the process, creating it on first use.
+    """
+    global _shared_rate_limiter
+    with _shared_rate_limiter_lock:
+        if _shared_rate_limiter is None:
+            _shared_rate_limiter = RateLimiter()
+        return _shared_rate_limiter
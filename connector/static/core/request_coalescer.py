@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+
+from connector.static.core import cancellation
+
+DEFAULT_TTL = float(os.environ.get('PRACTITEST_CACHE_TTL', 5))
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = int(os.environ.get('PRACTITEST_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """
+    Single-flight request coalescer with a short-lived result cache, shared by all blocks of the process.
+
+    The first caller of a key runs the fetch, identical calls made while it is in flight wait for its result
+    instead of sending their own request. Results of calls made with cache are then served from the cache for
+    ttl seconds, they should be small (e.g. response bodies rather than responses): the cache holds at most
+    max_entries results and max_bytes bytes (of the results having a length), the oldest are evicted first.
+    Failed fetches are not cached, their error is raised to every waiting caller.
+
+    :param ttl: Seconds a result is served from the cache, 0 to only coalesce in-flight calls.
+    :param max_entries: Maximum number of cached results.
+    :param max_bytes: Maximum total length of the cached results.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.evicted = 0
+        self._cache = {}  # key -> (expires_at, size, result), oldest first
+        self._cached_bytes = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, fetch, cache=True):
+        """
+        Returns the result of fetch for a key, from the cache, from an identical in-flight call or by calling it.
+
+        :param key: Key identifying the request, e.g. its URL.
+        :param fetch: Callable without arguments sending the request.
+        :param cache: If False, the result is only shared with the identical calls in flight, not cached.
+        :return: The result of fetch.
+        """
+        while True:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] > time.monotonic():
+                    self.hits += 1
+                    return cached[2]
+                call = self._in_flight.get(key)
+                if call is None:
+                    call = self._in_flight[key] = _Call()
+                    self.misses += 1
+                    break
+                self.coalesced += 1
+            while not call.done.wait(0.5):
+                cancellation.check_stopped()
+            if call.error is None:
+                return call.result
+            if not isinstance(call.error, Exception):
+                # The block of the caller running the fetch was stopped, fetch again for this caller
+                continue
+            raise call.error
+
+        try:
+            call.result = fetch()
+        except BaseException as e:
+            call.error = e
+            if isinstance(e, Exception):
+                self.errors += 1
+            raise
+        else:
+            if cache and self.ttl > 0:
+                with self._lock:
+                    self._store(key, call.result)
+            return call.result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+
+    def invalidate(self):
+        """
+        Drops every cached result, e.g. after a write that may change them.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._cached_bytes = 0
+
+    def stats(self):
+        """
+        Returns the coalescer counters as a dictionary.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced, 'errors': self.errors,
+                    'evicted': self.evicted, 'cached': len(self._cache), 'cached_bytes': self._cached_bytes,
+                    'in_flight': len(self._in_flight)}
+
+    def _store(self, key, result):
+        # Must be called with the lock held
+        size = len(result) if hasattr(result, '__len__') else 0
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self._cache[key] = (time.monotonic() + self.ttl, size, result)
+        self._cached_bytes += size
+        now = time.monotonic()
+        while len(self._cache) > self.max_entries or self._cached_bytes > self.max_bytes:
+            oldest = next(iter(self._cache))
+            if self._cache[oldest][0] > now:
+                self.evicted += 1
+            self._discard(oldest)
+
+    def _discard(self, key):
+        cached = self._cache.pop(key, None)
+        if cached is not None:
+            self._cached_bytes -= cached[1]
+
+
+_shared_coalescer = None
+_shared_coalescer_lock = threading.Lock()
+
+
+def get_shared_coalescer():
+    """
+    Returns the RequestCoalescer shared by all blocks of the process, creating it on first use.
+    """
+    global _shared_coalescer
+    with _shared_coalescer_lock:
+        if _shared_coalescer is None:
+            _shared_coalescer = RequestCoalescer()
+        return _shared_coalescer
@@ -0,0 +1,228 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get('PRACTITEST_MAX_ATTEMPTS', 5))
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_FAILURE_THRESHOLD = int(os.environ.get('PRACTITEST_BREAKER_THRESHOLD', 5))
+DEFAULT_RESET_TIMEOUT = float(os.environ.get('PRACTITEST_BREAKER_RESET_TIMEOUT', 30))
+
+CLOSED = 'CLOSED'
+OPEN = 'OPEN'
+HALF_OPEN = 'HALF_OPEN'
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+_cycle_stats = contextvars.ContextVar('cycle_stats', default=None)
+
+
+class RetriesExhaustedException(Exception):
+    pass
+
+
+class DeadlineExceededException(Exception):
+    pass
+
+
+class CircuitOpenException(Exception):
+    pass
+
+
+class RetryPolicy:
+    """
+    Bounded retries with decorrelated jitter: every delay is drawn between base_delay and three times the previous
+    delay, capped at max_delay, so concurrent callers spread out instead of retrying in lockstep.
+
+    :param max_attempts: Maximum number of calls, including the first one.
+    :param base_delay: Minimum seconds between two calls.
+    :param max_delay: Maximum seconds between two calls.
+    """
+    __slots__ = ('max_attempts', 'base_delay', 'max_delay')
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, previous_delay):
+        """
+        Returns the seconds to wait before the next call.
+
+        :param previous_delay: The previous delay, 0 before the first retry.
+        """
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3)))
+
+
+class CycleStats:
+    """
+    Retry counters of a block cycle, shared by the threads of the cycle.
+    """
+    __slots__ = ('retries', 'gave_up', '_lock')
+
+    def __init__(self):
+        self.retries = 0
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    def add(self, retries=0, gave_up=0):
+        with self._lock:
+            self.retries += retries
+            self.gave_up += gave_up
+
+
+_totals = CycleStats()
+
+
+def start_cycle(deadline=None):
+    """
+    Starts the retry budget of a block cycle: retries stop once deadline seconds have passed, and the retries of
+    the cycle are counted in a new CycleStats.
+
+    :param deadline: Seconds the cycle may spend, None for no deadline.
+    :return: Tokens to pass to end_cycle.
+    """
+    return (_deadline.set(time.monotonic() + deadline if deadline else None), _cycle_stats.set(CycleStats()))
+
+
+def end_cycle(tokens):
+    """
+    Ends the retry budget started by start_cycle.
+
+    :param tokens: Tokens returned by start_cycle.
+    :return: The CycleStats of the cycle.
+    """
+    deadline_token, stats_token = tokens
+    stats = _cycle_stats.get()
+    _cycle_stats.reset(stats_token)
+    _deadline.reset(deadline_token)
+    return stats
+
+
+def get_cycle_stats():
+    """
+    Returns the CycleStats of the current block cycle, or None outside of a cycle.
+    """
+    return _cycle_stats.get()
+
+
+def remaining_time():
+    """
+    Returns the seconds left before the deadline of the current cycle, or None without a deadline.
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def record_retry(gave_up=False):
+    """
+    Counts a retry, or a call given up, in the current cycle and in the process totals.
+    """
+    counts = {'gave_up': 1} if gave_up else {'retries': 1}
+    _totals.add(**counts)
+    stats = _cycle_stats.get()
+    if stats is not None:
+        stats.add(**counts)
+
+
+def get_retry_totals():
+    """
+    Returns the retry counters of the process as a dictionary.
+    """
+    return {'retries': _totals.retries, 'gave_up': _totals.gave_up}
+
+
+class CircuitBreaker:
+    """
+    Fails calls to a host fast while it is down.
+
+    After failure_threshold consecutive failures the breaker opens and calls raise CircuitOpenException without
+    reaching the host. After reset_timeout seconds a single probe call is let through (half open): its success
+    closes the breaker, its failure opens it again.
+
+    :param host: Host protected by the breaker.
+    :param failure_threshold: Consecutive failures opening the breaker.
+    :param reset_timeout: Seconds before an open breaker lets a probe through.
+    """
+
+    def __init__(self, host, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raises CircuitOpenException if the call must not reach the host.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenException(f'{self.host} is unavailable, circuit open, next probe in {retry_in:.0f}s')
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def snapshot(self):
+        """
+        Returns the state of the breaker as a JSON serializable dictionary.
+        """
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures, 'times_opened': self.times_opened,
+                    'rejected': self.rejected}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(url):
+    """
+    Returns the CircuitBreaker of the host of a URL, creating it on first use.
+
+    :param url: URL as string
+    """
+    host = urlparse(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+def get_breaker_states():
+    """
+    Returns the state of every circuit breaker, keyed by host.
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.host: breaker.snapshot() for breaker in breakers}
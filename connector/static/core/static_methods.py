@@ -1,14 +1,71 @@
-import json, requests
-from retrying import retry
+import requests
+import contextvars
+import functools
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from connector.static.core import cancellation
+from connector.static.core import codec
+from connector.static.core import retry_policy
+from connector.static.core.practitest_client import get_shared_client
+from connector.static.core.rate_limiter import account_key, get_shared_rate_limiter, parse_retry_after
+from connector.static.core.request_coalescer import get_shared_coalescer
+
+MAX_THROTTLED_ATTEMPTS = 10
+DEFAULT_RETRY_POLICY = retry_policy.RetryPolicy()
+# Exceptions that end the retries of every caller up the stack
+GIVE_UP_EXCEPTIONS = (retry_policy.RetriesExhaustedException, retry_policy.DeadlineExceededException,
+                      retry_policy.CircuitOpenException)
+
+
+def interruptible_retry(retry_on_exception=None, policy=None):
+    """Retries the decorated function on exceptions, up to the max attempts of the retry policy, waiting with
+    decorrelated jitter between the calls and never beyond the deadline of the current block cycle.
+    The waits are interrupted, and the retries stopped, as soon as the current block is asked to stop.
+    :param retry_on_exception: Function returning True for exceptions to retry on, all exceptions are retried if None
+    :param policy: RetryPolicy, DEFAULT_RETRY_POLICY if None
+    :return: decorator
 
-WAIT_EXPONENTIAL_MULTIPLIER = 10000
-WAIT_EXPONENTIAL_MAX = 60000
+    Raises:
+        RetriesExhaustedException: When the last attempt failed.
+        DeadlineExceededException: When the next attempt would start after the deadline of the cycle.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            retry = policy or DEFAULT_RETRY_POLICY
+            attempt = 1
+            delay = 0
+            while True:
+                cancellation.check_stopped()
+                try:
+                    return func(*args, **kwargs)
+                except GIVE_UP_EXCEPTIONS:
+                    raise
+                except Exception as e:
+                    if retry_on_exception is not None and not retry_on_exception(e):
+                        raise
+                    if attempt >= retry.max_attempts:
+                        retry_policy.record_retry(gave_up=True)
+                        raise retry_policy.RetriesExhaustedException(f'{e} (gave up after {attempt} attempts)') from e
+                    delay = retry.next_delay(delay)
+                    remaining = retry_policy.remaining_time()
+                    if remaining is not None and remaining < delay:
+                        retry_policy.record_retry(gave_up=True)
+                        raise retry_policy.DeadlineExceededException(f'{e} (cycle deadline reached after {attempt} attempts)') from e
+                retry_policy.record_retry()
+                cancellation.interruptible_sleep(delay)
+                attempt += 1
+        return wrapper
+    return decorator
 
 
 @staticmethod
-@retry(wait_exponential_multiplier=WAIT_EXPONENTIAL_MULTIPLIER, wait_exponential_max=WAIT_EXPONENTIAL_MAX)
+@interruptible_retry()
 def send_request(method, url, headers, data=''):
-    """Sends a GET/POST/PUT request.
+    """Sends a GET/POST/PUT request through the shared, connection pooling PractiTest client.
+    Connection errors and 5xx responses are recorded by the circuit breaker of the host, which fails the requests
+    fast while it is open.
     :param method: 'post' or 'get' or 'put' string
     :param url: URL as string
     :param headers: json as string
@@ -16,18 +73,23 @@ def send_request(method, url, headers, data=''):
     :return: response
     """
     method = str(method).lower()
+    breaker = retry_policy.get_circuit_breaker(url)
+    breaker.before_call()
     try:
         if method == 'get':
-            r = requests.get(url, headers=headers, verify=False)
-        elif method == 'post':
-            r = requests.post(url, headers=headers, data=data, verify=False)
-        elif method == 'put':
-            r = requests.put(url, headers=headers, data=data, verify=False)
+            r = get_shared_client().request('get', url, headers=headers)
+        elif method in ('post', 'put'):
+            r = get_shared_client().request(method, url, headers=headers, data=data)
         else:
             print(f'Unknown request method: {method}')
             return
     except requests.exceptions.RequestException:
+        breaker.record_failure()
         raise Exception("WARNING: Failed to send request, going to retry")
+    if r.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
     return r
 
 
@@ -40,9 +102,25 @@ def not_immediate_exit(exception):
 
 
 @staticmethod
-@retry(retry_on_exception=not_immediate_exit, wait_exponential_multiplier=WAIT_EXPONENTIAL_MULTIPLIER, wait_exponential_max=WAIT_EXPONENTIAL_MAX)
+def get_content_200(url, headers, msg_on_retry, cache=False):
+    """Sends a GET request, verify code 200, else retry, and returns the response body.
+    Identical GET requests of all blocks in flight at the same time are coalesced, see request_coalescer.
+    With cache, the body is also cached for a few seconds, meant for small responses polled by many blocks.
+    :param url: URL as string
+    :param headers: json as string
+    :param msg_on_retry: msg printed upon fail
+    :param cache: If True, the body is cached for the coalescer TTL
+    :return: response body as bytes
+    """
+    return get_shared_coalescer().get(url, lambda: _wait_for_request_200('get', url, headers, msg_on_retry).content,
+                                      cache=cache)
+
+
+@staticmethod
 def wait_for_request_200(method, url, headers, msg_on_retry, data=''):
     """Sends a GET/POST/PUT request and verify code 200, else retry.
+    Identical GET requests of all blocks in flight at the same time are coalesced, see request_coalescer, a
+    POST/PUT request drops the cached responses of get_content_200.
     :param method: 'post' or 'get' or 'put' string
     :param url: URL as string
     :param headers: json as string
@@ -50,15 +128,48 @@ def wait_for_request_200(method, url, headers, msg_on_retry, data=''):
     :param data: data/json as string if sending 'post' or 'put' request
     :return: response
     """
-    r = send_request(method, url, headers, data)
+    if str(method).lower() == 'get':
+        return get_shared_coalescer().get(url, lambda: _wait_for_request_200(method, url, headers, msg_on_retry, data),
+                                          cache=False)
+    try:
+        return _wait_for_request_200(method, url, headers, msg_on_retry, data)
+    finally:
+        get_shared_coalescer().invalidate()
+
+
+@staticmethod
+def send_rate_limited_request(method, url, headers, data=''):
+    """Sends a GET/POST/PUT request once the shared rate limiter of the account allows it.
+    A 429 response pauses every request of the account for the Retry-After time of the server, then the request
+    is sent again, up to MAX_THROTTLED_ATTEMPTS times.
+    :param method: 'post' or 'get' or 'put' string
+    :param url: URL as string
+    :param headers: json as string
+    :param data: data/json as string if sending 'post' or 'put' request
+    :return: response
+    """
+    limiter = get_shared_rate_limiter()
+    account = account_key(url)
+    for _ in range(MAX_THROTTLED_ATTEMPTS):
+        limiter.acquire(account)
+        r = send_request(method, url, headers, data)
+        if r is None or r.status_code != 429:
+            return r
+        limiter.pause(account, parse_retry_after(r.headers.get('Retry-After')))
+    raise Exception(f'WARNING: Request throttled {MAX_THROTTLED_ATTEMPTS} times, going to retry')
+
+
+@interruptible_retry(retry_on_exception=not_immediate_exit)
+def _wait_for_request_200(method, url, headers, msg_on_retry, data=''):
+    r = send_rate_limited_request(method, url, headers, data)
     if r.status_code == 200:
         return r
     elif r.status_code >= 400:
         try:
-            error_data = json.loads(r.text)
+            error_data = codec.loads(r.content)
             error_message = error_data["errors"][0]["title"]
             raise ImmediateExitException(error_message)
-        except json.JSONDecodeError:
+        except codec.DecodeError:
             raise ImmediateExitException("Failed to parse error message from server response.")
         except KeyError:
             raise ImmediateExitException("Unexpected error format.")
@@ -99,8 +210,7 @@ def load_json_config(json_path):
         Exception: If there's an issue reading the file or parsing the JSON, an error message is printed and the program exits with code 1.
     """
     try:
-        with open(json_path) as f:
-            return json.load(f)
+        return codec.load_file(json_path)
     except Exception:
         print(f'Failed to read json from {json_path}')
         exit(1)
@@ -123,22 +233,16 @@ def get_dict_data_if_not_empty(dictionary):
 @staticmethod
 def create_data_for_test_set_multiple_custom_fields(custom_fields_dict):
     """Creates generic data for updating multiple custom fields in test set by sending one request
-    :param custom_fields_dict:
+    :param custom_fields_dict: Dictionary of custom field ID to value, list values are sent as JSON arrays
     :return: data as json string
     """
-    template_suffix = '}}}}'
-    data = '{"data": { "type": "sets", "attributes": {"custom-fields": {'
-
-    for custom_field in custom_fields_dict:
-        if type(custom_fields_dict[custom_field]) is list:
-            data = data + '"' + str(custom_field) + '": ' + str(custom_fields_dict[custom_field])
+    custom_fields = {}
+    for custom_field, value in custom_fields_dict.items():
+        if type(value) is list:
+            custom_fields[str(custom_field)] = [str(item) for item in value]
         else:
-            data = data + '"' + str(custom_field) + '": "' + str(custom_fields_dict[custom_field]) + '"'
-        # if not last, add ',' at the end
-        if custom_field != list(custom_fields_dict.keys())[-1]:
-            data = data + ','
-    data = data + template_suffix
-    return data
+            custom_fields[str(custom_field)] = str(value)
+    return codec.dumps({"data": {"type": "sets", "attributes": {"custom-fields": custom_fields}}})
 
 
 @staticmethod
@@ -156,13 +260,11 @@ def safe_len(obj):
 def load_data_from_json(json_path):
     """Load data from a JSON file and return as a dictionary."""
     try:
-        with open(json_path, "r") as file:
-            data = json.load(file)
-            return data
+        return codec.load_file(json_path)
     except FileNotFoundError:
         print(f"Error: The file {json_path} was not found.")
         return None
-    except json.JSONDecodeError:
+    except codec.DecodeError:
         print(f"Error: The file {json_path} does not contain valid JSON.")
         return None
 
@@ -178,7 +280,7 @@ def dict_to_single_line_json(data_dict):
     Returns:
     - str: Single-line JSON string representation of the dictionary.
     """
-    return json.dumps(data_dict)
+    return codec.dumps(data_dict)
 
 
 @staticmethod
@@ -207,10 +309,71 @@ def try_to_get_from_dict(dictionary, key, default_value='None', is_boolean=False
 @staticmethod
 def write_dict_to_json_file(data_dict, filename):
     """
-    Write a dictionary to a JSON file.
+    Write a dictionary to a compact JSON file.
 
     :param data_dict: Dictionary to be written.
     :param filename: Name of the file to write to.
     """
-    with open(filename, 'w') as f:
-        json.dump(data_dict, f, indent=2)
+    codec.dump_file(data_dict, filename)
+
+
+@staticmethod
+def concurrent_map(func, items, max_workers):
+    """
+    Calls a function for every item on a bounded thread pool.
+
+    :param func: Function to call with each item.
+    :param items: Iterable of items.
+    :param max_workers: Maximum number of concurrent calls.
+    :return: List of results, in the same order as the items.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    # Every call runs in a copy of the caller context, so it sees the stop event of the current block
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(lambda context, item: context.run(func, item), contexts, items))
+
+
+@staticmethod
+def concurrent_imap(func, items, max_workers, window=None):
+    """
+    Lazy concurrent_map: calls a function for every item on a bounded thread pool and yields the results in item
+    order as soon as they are available. At most window calls are submitted ahead of the consumer, so the results
+    held in memory are bounded however many items there are. The first window calls are submitted right away,
+    before the first result is requested, so they run while the caller is still busy.
+
+    :param func: Function to call with each item.
+    :param items: Iterable of items, consumed lazily.
+    :param max_workers: Maximum number of concurrent calls.
+    :param window: Maximum number of calls running or done but not yet consumed, max_workers if None.
+    :return: Generator of results, in the same order as the items. Closing it cancels the calls not started yet.
+    """
+    window = max(1, window or max_workers)
+    items = iter(items)
+    if max_workers <= 1 or window <= 1:
+        return (func(item) for item in items)
+    results = _iter_concurrent_results(func, items, min(max_workers, window), window)
+    next(results)  # Submits the first window of calls
+    return results
+
+
+def _iter_concurrent_results(func, items, max_workers, window):
+    # Generator of concurrent_imap, it yields None once the first window of calls is submitted
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    try:
+        # Every call runs in a copy of the caller context, so it sees the stop event of the current block
+        for item in itertools.islice(items, window):
+            pending.append(executor.submit(contextvars.copy_context().run, func, item))
+        yield
+        while pending:
+            result = pending.popleft().result()
+            for item in itertools.islice(items, 1):
+                pending.append(executor.submit(contextvars.copy_context().run, func, item))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,392 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django import db
+from django.conf import settings
+
+from connector.static.core import cancellation
+from connector.static.core import retry_policy
+
+SCHEDULED = 'SCHEDULED'
+RUNNING = 'RUNNING'
+STOPPING = 'STOPPING'
+STOPPED = 'STOPPED'
+
+IDLE = 'IDLE'  # Returned by a cycle that found nothing to do
+
+
+class AdaptivePollingSchedule:
+    """
+    Interval between the cycles of a block, adapted to the work the block finds.
+
+    After a cycle that found work the interval is min_interval, so follow-up triggers are picked up quickly.
+    Every idle cycle multiplies it by factor, up to max_interval, and so does every trigger probe that found no
+    work, up to probe_max_interval. Each interval is spread by +/- jitter (a fraction of the interval), so blocks
+    started together do not poll at the same moments.
+
+    :param min_interval: Seconds between cycles while the block finds work.
+    :param max_interval: Maximum seconds between two idle cycles.
+    :param factor: Growth of the interval after every idle cycle or empty probe.
+    :param jitter: Fraction of the interval randomly added or removed.
+    :param probe_max_interval: Maximum seconds between two trigger probes, max_interval if None.
+    """
+    __slots__ = ('min_interval', 'max_interval', 'probe_max_interval', 'factor', 'jitter', 'interval')
+
+    def __init__(self, min_interval=10, max_interval=80, factor=2, jitter=0.1, probe_max_interval=None):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.probe_max_interval = max(min_interval, min(probe_max_interval or self.max_interval, self.max_interval))
+        self.factor = factor
+        self.jitter = jitter
+        self.interval = min_interval
+
+    def next_interval(self, found_work):
+        """
+        Returns the seconds to wait before the next cycle.
+
+        :param found_work: Whether the last cycle found work.
+        """
+        if found_work:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.factor, self.max_interval)
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def next_probe_interval(self):
+        """
+        Returns the seconds to wait before the next trigger probe of an idle block, after an idle cycle or a probe
+        that found no work. The jitter only shortens probe intervals, so they never exceed probe_max_interval.
+        """
+        self.interval = min(self.interval * self.factor, self.probe_max_interval)
+        return self.interval * random.uniform(1 - self.jitter, 1)
+
+
+class BlockTask:
+    """
+    Handle of a single block multiplexed by the BlockSupervisor.
+
+    A block is no longer an OS process, it is a small record describing the cycle callable to run,
+    its arguments and the bookkeeping the supervisor exposes as per-block state.
+    """
+    __slots__ = ('block_id', 'cycle', 'args', 'is_active', 'probe', 'schedule', 'state', 'cycles', 'idle_cycles',
+                 'probes', 'retries', 'last_cycle_retries', 'last_error', 'started_at', 'last_cycle_at', 'next_run_at',
+                 'probing', 'stop_requested', 'stop_event', 'idle')
+
+    def __init__(self, block_id, cycle, args, is_active=None, schedule=None, probe=None):
+        self.block_id = block_id
+        self.cycle = cycle
+        self.args = args
+        self.is_active = is_active
+        self.probe = probe
+        self.schedule = schedule
+        self.state = SCHEDULED
+        self.cycles = 0
+        self.idle_cycles = 0
+        self.probes = 0
+        self.retries = 0
+        self.last_cycle_retries = 0
+        self.last_error = None
+        self.started_at = time.time()
+        self.last_cycle_at = None
+        self.next_run_at = None
+        self.probing = False  # Whether the block is idle and polled by its probe instead of its cycle
+        self.stop_requested = False
+        self.stop_event = threading.Event()  # Interrupts the sleeps and retries of the running cycle
+        self.idle = threading.Event()  # Set while no cycle of the block is running
+        self.idle.set()
+
+    def snapshot(self):
+        """
+        Returns the public state of the task as a JSON serializable dictionary.
+        """
+        return {
+            'block_id': self.block_id,
+            'state': self.state,
+            'cycles': self.cycles,
+            'idle_cycles': self.idle_cycles,
+            'probes': self.probes,
+            'probing': self.probing,
+            'retries': self.retries,
+            'last_cycle_retries': self.last_cycle_retries,
+            'interval': self.schedule.interval,
+            'last_error': self.last_error,
+            'started_at': self.started_at,
+            'last_cycle_at': self.last_cycle_at,
+        }
+
+
+class BlockSupervisor:
+    """
+    Long-lived worker runtime that multiplexes many blocks on a bounded thread pool.
+
+    Every block is a scheduled task: a single scheduler thread keeps a heap of due times and hands each due
+    block to the worker pool for one cycle. When the cycle returns the block is rescheduled according to its
+    AdaptivePollingSchedule (further away when the cycle returned IDLE), unless it returned False or a stop
+    was requested. A block started with a probe callable (a cheap check for new work) is polled by its probe
+    instead of its cycle once a cycle returned IDLE: the probe interval backs off like the cycles, but only up to
+    pickup_target seconds, and the cycle runs again as soon as a probe returns True. An idle block then costs a
+    single probe every pickup_target seconds, and no new trigger waits longer than that to be picked up.
+
+    Stopping a block sets its stop event, which interrupts the sleeps and retries of its running cycle
+    (see cancellation). Blocks started with an is_active callable are also stopped when it returns False,
+    it is polled every watch_interval seconds, so a stop requested by another process is noticed quickly.
+
+    :param max_workers: Maximum number of block cycles executed at the same time.
+    :param interval: Default seconds between two cycles of a block that finds work.
+    :param max_interval: Default maximum seconds between two idle cycles of a block.
+    :param jitter: Fraction of the interval randomly added or removed.
+    :param cycle_deadline: Seconds a cycle may spend retrying requests, see retry_policy.start_cycle.
+    :param watch_interval: Seconds between two is_active checks of the running blocks.
+    :param pickup_target: Maximum seconds between two probes of an idle block, max_interval if None.
+    """
+
+    def __init__(self, max_workers=8, interval=10, max_interval=80, jitter=0.1, cycle_deadline=None, watch_interval=1,
+                 pickup_target=None):
+        self.max_workers = max_workers
+        self.cycle_deadline = cycle_deadline
+        self.interval = interval
+        self.max_interval = max_interval
+        self.pickup_target = pickup_target
+        self.jitter = jitter
+        self.watch_interval = watch_interval
+        self._tasks = {}
+        self._queue = []  # Heap of (run_at, sequence, task)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._executor = None
+        self._scheduler = None
+        self._watcher = None
+
+    def start_block(self, block_id, cycle, *args, is_active=None, probe=None, min_interval=None, max_interval=None):
+        """
+        Starts supervising a block. If the block is already supervised, its arguments are replaced and
+        will be used from the next cycle on. If the block is stopping, its first cycle waits for the running
+        cycle of the stopped block to return, so two cycles of a block never run at the same time.
+
+        :param block_id: ID of the block.
+        :param cycle: Callable running one cycle of the block, returns False when the block should stop and
+            IDLE when it found nothing to do.
+        :param args: Arguments passed to the cycle callable.
+        :param is_active: Optional callable returning False when the block should stop.
+        :param probe: Optional cheap callable returning True when the block has work, called instead of the cycle
+            while the block is idle.
+        :param min_interval: Seconds between cycles while the block finds work, the supervisor interval if None.
+        :param max_interval: Maximum seconds between idle cycles, the supervisor max_interval if None.
+        :return: The BlockTask of the block.
+        """
+        schedule = AdaptivePollingSchedule(min_interval or self.interval, max_interval or self.max_interval,
+                                           jitter=self.jitter, probe_max_interval=self.pickup_target)
+        with self._condition:
+            self._ensure_started()
+            task = self._tasks.get(block_id)
+            if task is not None and not task.stop_requested:
+                task.cycle = cycle
+                task.args = args
+                task.is_active = is_active
+                task.probe = probe
+                task.schedule = schedule
+                return task
+            previous = task
+            task = BlockTask(block_id, cycle, args, is_active, schedule, probe)
+            self._tasks[block_id] = task
+            if previous is None or (previous.idle.is_set() and previous.next_run_at is not None):
+                self._schedule(task, 0)
+            # Otherwise a cycle of the stopped block is still running, it schedules the task when it returns
+            return task
+
+    def stop_block(self, block_id, timeout=None):
+        """
+        Requests a block to stop. A block waiting for its next cycle stops immediately, a block in the
+        middle of a cycle is interrupted at its next sleep, retry or request.
+
+        :param block_id: ID of the block.
+        :param timeout: Seconds to wait for the running cycle to return. If it returns in time, the block is
+            reaped (removed from the supervised blocks), otherwise it stays in the STOPPING state until it returns.
+        :return: The BlockTask of the block, or None if the block is not supervised.
+        """
+        with self._condition:
+            task = self._tasks.get(block_id)
+            if task is None:
+                return None
+            self._request_stop(task)
+        # A task still waiting for the cycle of a previous stop is reaped once that cycle returns
+        if timeout is not None and task.next_run_at is not None and task.idle.wait(timeout):
+            with self._condition:
+                if self._tasks.get(block_id) is task:
+                    del self._tasks[block_id]
+        return task
+
+    def get_state(self, block_id):
+        """
+        Returns the state of a supervised block, or None if the block is not supervised.
+
+        :param block_id: ID of the block.
+        """
+        with self._condition:
+            task = self._tasks.get(block_id)
+            return task.snapshot() if task is not None else None
+
+    def get_states(self):
+        """
+        Returns the state of every supervised block, keyed by block ID.
+        """
+        with self._condition:
+            return {block_id: task.snapshot() for block_id, task in self._tasks.items()}
+
+    def _ensure_started(self):
+        if self._scheduler is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='block-worker')
+            self._scheduler = threading.Thread(target=self._schedule_loop, name='block-supervisor', daemon=True)
+            self._scheduler.start()
+            self._watcher = threading.Thread(target=self._watch_loop, name='block-watcher', daemon=True)
+            self._watcher.start()
+
+    def _request_stop(self, task):
+        # Must be called with the condition held
+        task.stop_requested = True
+        task.stop_event.set()
+        task.state = STOPPED if task.idle.is_set() else STOPPING
+        self._condition.notify()
+
+    def _schedule(self, task, delay):
+        task.next_run_at = time.monotonic() + delay
+        heapq.heappush(self._queue, (task.next_run_at, next(self._sequence), task))
+        self._condition.notify()
+
+    def _schedule_loop(self):
+        while True:
+            with self._condition:
+                while not self._queue or self._queue[0][0] > time.monotonic():
+                    timeout = self._queue[0][0] - time.monotonic() if self._queue else None
+                    self._condition.wait(timeout)
+                _, _, task = heapq.heappop(self._queue)
+                if task.stop_requested or self._tasks.get(task.block_id) is not task:
+                    continue
+                task.state = RUNNING
+                task.idle.clear()
+            self._executor.submit(self._run_task, task)
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.watch_interval)
+            with self._condition:
+                tasks = [task for task in self._tasks.values() if task.is_active is not None and not task.stop_requested]
+            for task in tasks:
+                try:
+                    is_active = task.is_active()
+                except Exception:
+                    continue
+                finally:
+                    db.close_old_connections()
+                if not is_active:
+                    with self._condition:
+                        self._request_stop(task)
+
+    def _run_task(self, task):
+        if task.probing and not self._run_probe(task):
+            return
+        self._run_cycle(task)
+
+    def _run_probe(self, task):
+        """
+        Runs the probe of an idle block. If it finds no work, reschedules the block to its next probe.
+
+        :return: True if the cycle should run now (the probe found work or failed).
+        """
+        found_work = True
+        token = cancellation.set_stop_event(task.stop_event)
+        retry_tokens = retry_policy.start_cycle(self.cycle_deadline)
+        try:
+            found_work = bool(task.probe())
+        except cancellation.BlockStoppedException:
+            found_work = False
+        except Exception:
+            pass  # The cycle reports the error
+        finally:
+            retry_policy.end_cycle(retry_tokens)
+            cancellation.reset_stop_event(token)
+            db.close_old_connections()
+        if found_work and not task.stop_requested:
+            return True
+
+        with self._condition:
+            task.probes += 1
+            if task.stop_requested:
+                task.state = STOPPED
+            else:
+                task.state = SCHEDULED
+                self._schedule(task, task.schedule.next_probe_interval())
+            task.idle.set()
+            self._start_successor(task)
+        return False
+
+    def _run_cycle(self, task):
+        result = None
+        token = cancellation.set_stop_event(task.stop_event)
+        retry_tokens = retry_policy.start_cycle(self.cycle_deadline)
+        try:
+            result = task.cycle(*task.args)
+            task.last_error = None
+        except cancellation.BlockStoppedException:
+            result = False
+        except Exception as e:
+            task.last_error = str(e)
+        finally:
+            cycle_stats = retry_policy.end_cycle(retry_tokens)
+            cancellation.reset_stop_event(token)
+            db.close_old_connections()
+
+        with self._condition:
+            task.cycles += 1
+            task.last_cycle_at = time.time()
+            task.last_cycle_retries = cycle_stats.retries
+            task.retries += cycle_stats.retries
+            if result == IDLE:
+                task.idle_cycles += 1
+            if task.stop_requested or result is False:
+                task.stop_requested = True
+                task.state = STOPPED
+            else:
+                task.state = SCHEDULED
+                task.probing = task.probe is not None and result == IDLE
+                if task.probing:
+                    self._schedule(task, task.schedule.next_probe_interval())
+                else:
+                    self._schedule(task, task.schedule.next_interval(result != IDLE))
+            task.idle.set()
+            self._start_successor(task)
+
+    def _start_successor(self, task):
+        # Must be called with the condition held, once a cycle of a task returned: a task started for the same
+        # block while the cycle was running was not scheduled yet
+        successor = self._tasks.get(task.block_id)
+        if successor is None or successor is task or successor.next_run_at is not None:
+            return
+        if successor.stop_requested:
+            del self._tasks[task.block_id]
+        else:
+            self._schedule(successor, 0)
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor():
+    """
+    Returns the process wide BlockSupervisor, creating it on first use.
+    """
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = BlockSupervisor(max_workers=settings.BLOCK_SUPERVISOR_MAX_WORKERS,
+                                          interval=settings.BLOCK_POLL_INTERVAL,
+                                          max_interval=settings.BLOCK_POLL_MAX_INTERVAL,
+                                          jitter=settings.BLOCK_POLL_JITTER,
+                                          cycle_deadline=settings.BLOCK_CYCLE_DEADLINE,
+                                          pickup_target=settings.BLOCK_PICKUP_TARGET)
+        return _supervisor
@@ -14,27 +14,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from channels.routing import ProtocolTypeRouter, URLRouter
 from django.urls import path, re_path
 from django.contrib import admin
 from . import views  # Assuming the views are in the same directory for now
 from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
-from connector import consumers
-
-websocket_urlpatterns = [
-    path('ws/console/', consumers.ConsoleConsumer.as_asgi()),
-]
-
-application = ProtocolTypeRouter({
-    'websocket': URLRouter(websocket_urlpatterns)
-})
 
 urlpatterns = [
     path('app/', views.vue_app, name='vue_app'),
     path('get_console_output/<int:block_id>/', views.get_console_output, name='get_console_output'),
+    path('get_console_tail/<int:block_id>/', views.get_console_tail, name='get_console_tail'),
     path('get_block_status/<int:block_id>/', views.get_block_status, name='get_block_status'),
+    path('get_dashboard_snapshot/', views.get_dashboard_snapshot, name='get_dashboard_snapshot'),
+    path('get_supervisor_status/', views.get_supervisor_status, name='get_supervisor_status'),
     path('admin/', admin.site.urls),
     path('list_blocks/', views.list_blocks, name='list_blocks'),
     path('start_block/<int:block_id>/', views.start_block, name='start_block'),
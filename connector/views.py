@@ -1,20 +1,28 @@
-import datetime
+import hashlib
 import json
 from rest_framework.decorators import api_view
+from connector.static.core.base_practitest import BasePractiTest
 from connector.static.core.kms.kms_practitest import KmsPractiTest
 import time
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpResponseNotModified
+from django.db.models import Case, F, Q, When, Window
+from django.db.models.functions import RowNumber
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render, redirect
 from .static.core import static_methods
-from multiprocessing import Process
-import os
-import django
+from .static.core.dispatch_sinks import DEFAULT_SINK
+from .static.core.rate_limiter import get_shared_rate_limiter
+from .static.core.retry_policy import get_breaker_states, get_cycle_stats, get_retry_totals
+from .static.core.request_coalescer import get_shared_coalescer
+from .supervisor import IDLE, get_supervisor
+from .log_writer import get_log_writer
+from .events import publish_block_status
+from .block_state import cache_block_state, forget_block_state, get_block_state
 from django.db import transaction
 
-# Set up the Django settings module for new processes
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'connector.settings')
-block_processes = {}  # Dictionary to store processes by ID
+CONSOLE_TAIL_LIMIT = 200
+CONSOLE_TAIL_MAX_LIMIT = 1000
 
 def log_message_to_block(block, message):
     """
@@ -23,8 +31,7 @@ def log_message_to_block(block, message):
     :param block: The block object.
     :param message: The message to be logged.
     """
-    from .models import LogEntry
-    LogEntry.objects.create(block=block, content=f"[{datetime.datetime.now()}] {message}")
+    get_log_writer().write(block.id, message)
 
 
 def list_blocks(request):
@@ -41,42 +48,44 @@ def list_blocks(request):
     return render(request, 'list_blocks.html', {'blocks': blocks})
 
 
-@csrf_exempt
-def _run_service_indefinitely(data, block_id, initial_data):
+def _run_block_cycle(data, block_id, initial_data):
     """
-    Runs a service continuously based on specific conditions.
+    Runs a single cycle of a block service, scheduled by the block supervisor.
 
     :param data: Configuration data for the service.
     :param block_id: ID of the associated block.
     :param initial_data: Initial data for the service.
+    :return: False if the block should not be scheduled again, IDLE if it found nothing to do, otherwise True.
     """
-    # Set up Django
-    django.setup()
-    # Close existing database connections
-    from django import db
-    db.connections.close_all()
-    # Now, you can safely import your models and use Django functionalities
     from .models import Block
-    block_id = int(block_id)
+    try:
+        state = get_block_state(block_id)
+    except Block.DoesNotExist:
+        return False
+    if not state['is_running']:
+        return False
 
-    while True:
-        # Fetch the block object inside the loop
-        block = Block.objects.get(id=block_id)
-        if not block.is_running:
-            break
+    if state['filter_id_list'] and not state['filter_id_list'] == 'None':
+        initial_data['practitest_trigger_filter_id_list'] = state['filter_id_list']
 
-        if block.filter_id_list and not block.filter_id_list == 'None':
-            initial_data['practitest_trigger_filter_id_list'] = block.filter_id_list
+    if data['app_name'] == 'kms':
+        more_data = static_methods.load_data_from_json("connector/static/core/kms/optional.json")
+        instance = KmsPractiTest(more_data, block_id=block_id, **initial_data)
+        try:
+            found_work = instance.start_service()
+        except static_methods.GIVE_UP_EXCEPTIONS as e:
+            # PractiTest is unavailable, give up this cycle and let the schedule back off
+            instance.log(f"PractiTest unavailable, skipping this cycle: {e}")
+            found_work = False
+        cycle_stats = get_cycle_stats()
+        if cycle_stats is not None and cycle_stats.retries:
+            instance.log(f"{cycle_stats.retries} PractiTest request retries this cycle")
+        return True if found_work else IDLE
 
-        if data['app_name'] == 'kms':
-            more_data = static_methods.load_data_from_json("connector/static/core/kms/optional.json")
-            instance = KmsPractiTest(more_data, block_id=block_id, **initial_data)
-            instance.start_service()
-            time.sleep(10)
-        else:
-            log_message_to_block(block, f"Unknown Application Name: {data['app_name']}.")
-            set_block_status_not_running(block)
-            break
+    block = Block.objects.get(id=block_id)
+    log_message_to_block(block, f"Unknown Application Name: {data['app_name']}.")
+    set_block_status_not_running(block)
+    return False
 
 
 @csrf_exempt
@@ -96,13 +105,54 @@ def start_block(request, block_id):
     initial_data = _load_initial_data(data)
 
     set_block_status_running(block)
-    process = Process(target=_run_service_indefinitely, args=(data, block_id, initial_data))
-    process.start()
-    block_processes[block_id] = process
+    get_supervisor().start_block(block_id, _run_block_cycle, data, block_id, initial_data,
+                                 is_active=lambda: _is_block_active(block_id),
+                                 probe=lambda: _probe_block_triggers(data, block_id, initial_data),
+                                 min_interval=block.poll_min_interval,
+                                 max_interval=block.poll_max_interval)
 
     return JsonResponse({'status': 'starting...'})
 
 
+def _probe_block_triggers(data, block_id, initial_data):
+    """
+    Checks whether test sets are waiting under the trigger filters of a block, run by the block supervisor
+    instead of the cycle while the block is idle. Only fetches the test sets of the filters, the cached
+    response is reused by the cycle it triggers.
+
+    :param data: Configuration data for the service.
+    :param block_id: ID of the associated block.
+    :param initial_data: Initial data for the service.
+    :return: True if the block should run a cycle now.
+    """
+    from .models import Block
+    if data['app_name'] != 'kms':
+        return True
+    try:
+        state = get_block_state(block_id)
+    except Block.DoesNotExist:
+        return True
+    filter_id_list = initial_data['practitest_trigger_filter_id_list']
+    if state['filter_id_list'] and not state['filter_id_list'] == 'None':
+        filter_id_list = state['filter_id_list']
+    instance = BasePractiTest(block_id=block_id, **initial_data)
+    return instance.get_count_of_test_sets_under_filter(filter_id_list) > 0
+
+
+def _is_block_active(block_id):
+    """
+    Returns True while the block should keep running, polled by the block supervisor so that stops
+    requested through another process interrupt the running cycle.
+
+    :param block_id: ID of the block.
+    """
+    from .models import Block
+    try:
+        return get_block_state(block_id)['is_running']
+    except Block.DoesNotExist:
+        return False
+
+
 def set_block_status_running(block):
     """
     Updates the status of a block to 'running'.
@@ -112,6 +162,8 @@ def set_block_status_running(block):
     block.status = "RUNNING"
     block.is_running = True
     block.save()
+    cache_block_state(block)
+    publish_block_status(block.id, block.status)
 
 
 def set_block_status_not_running(block):
@@ -123,7 +175,10 @@ def set_block_status_not_running(block):
     block.status = "NOT RUNNING"
     block.is_running = False
     block.save()
+    cache_block_state(block)
+    publish_block_status(block.id, block.status)
     log_message_to_block(block, f'Service Stopped')
+    get_log_writer().flush()
 
 
 def _fetch_and_save_block_data(request, block):
@@ -141,17 +196,36 @@ def _fetch_and_save_block_data(request, block):
     block.aws_access_key = data['aws_access_key']
     block.aws_secret_key = data['aws_secret_key']
     block.filter_id_list = data['filter_id_list']
+    block.dispatch_sink = data.get('dispatch_sink') or block.dispatch_sink
+    block.dispatch_target = data.get('dispatch_target', block.dispatch_target)
+    if 'poll_min_interval' in data:
+        block.poll_min_interval = _parse_interval(data['poll_min_interval'])
+    if 'poll_max_interval' in data:
+        block.poll_max_interval = _parse_interval(data['poll_max_interval'])
     block.save()
+    cache_block_state(block)
     return data
 
 
+def _parse_interval(value):
+    """
+    Converts a polling interval entered in the dashboard to seconds, empty or invalid values to None (the default).
+
+    :param value: Number of seconds, as a number or a string.
+    """
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
 def _load_initial_data(data):
     """
     Loads initial data from a specified JSON file and updates it with data from the provided dictionary.
 
     The method reads data from the "connector/static/core/initialize.json" file and then updates specific fields with values from the input dictionary.
 
-    :param data: Dictionary containing key-value pairs to update the loaded data with. Expected keys include 'app_name', 'pt_username', 'pt_token', 'aws_access_key', and 'aws_secret_key'.
+    :param data: Dictionary containing key-value pairs to update the loaded data with. Expected keys include 'app_name', 'pt_username', 'pt_token', 'aws_access_key', and 'aws_secret_key', optionally 'dispatch_sink' and 'dispatch_target'.
     :return: Dictionary containing the merged data from the JSON file and the input dictionary.
     """
     initial_data = static_methods.load_data_from_json("connector/static/core/initialize.json")
@@ -160,6 +234,8 @@ def _load_initial_data(data):
     initial_data["pt_token"] = data['pt_token']
     initial_data["access_key"] = data['aws_access_key']
     initial_data["secret_key"] = data['aws_secret_key']
+    initial_data["dispatch_sink"] = data.get('dispatch_sink') or DEFAULT_SINK
+    initial_data["dispatch_target"] = data.get('dispatch_target')
     return initial_data
 
 
@@ -176,9 +252,12 @@ def stop_block(request, block_id):
     block = Block.objects.get(id=block_id)
     block.status = "NOT RUNNING"
     block.save()
+    cache_block_state(block)
+    publish_block_status(block.id, block.status)
 
     if block.is_running:
         set_block_status_not_running(block)
+    get_supervisor().stop_block(block_id, timeout=settings.BLOCK_STOP_TIMEOUT)
 
     return JsonResponse({"status": "STOPPED"})
 
@@ -194,7 +273,9 @@ def delete_block(request, block_id):
     from .models import Block
     block = Block.objects.get(id=block_id)
     log_message_to_block(block, f"Service {block_id} deleted.")
+    get_supervisor().stop_block(block.id, timeout=settings.BLOCK_STOP_TIMEOUT)
     block.delete()
+    forget_block_state(block_id)
     return JsonResponse({'status': 'success'})
 
 
@@ -259,7 +340,7 @@ def get_console_output(request, block_id):
     from .models import Block
     try:
         block = Block.objects.get(pk=block_id)
-        logs = block.log_entries.order_by('-timestamp').values_list('content', flat=True)
+        logs = block.log_entries.order_by('-id').values_list('content', flat=True)
         return JsonResponse({'console_output': "\n".join(logs)})
     except Block.DoesNotExist:
         return JsonResponse({'error': 'Block not found'}, status=404)
@@ -267,6 +348,110 @@ def get_console_output(request, block_id):
         return JsonResponse({'error': f"An error occurred: {str(e)}"}, status=500)
 
 
+def get_console_tail(request, block_id):
+    """
+    Fetches the console output entries of a specific block added after a given log entry.
+
+    Query parameters:
+    - since_id: ID of the last log entry the client already has. If missing, the latest entries are returned.
+    - limit: Maximum number of entries to return (default CONSOLE_TAIL_LIMIT, at most CONSOLE_TAIL_MAX_LIMIT).
+
+    :param request: The HTTP request object.
+    :param block_id: ID of the block for which console output is needed.
+    :return: JSON response with the entries, oldest first, the ID of the last entry and whether more entries exist.
+    """
+    from .models import Block, LogEntry
+    try:
+        since_id = request.GET.get('since_id')
+        limit = min(int(request.GET.get('limit', CONSOLE_TAIL_LIMIT)), CONSOLE_TAIL_MAX_LIMIT)
+        log_entries = LogEntry.objects.filter(block_id=block_id)
+        if since_id is not None:
+            since_id = int(since_id)
+            entries = list(log_entries.filter(id__gt=since_id).order_by('id').values('id', 'content')[:limit + 1])
+        else:
+            entries = list(log_entries.order_by('-id').values('id', 'content')[:limit + 1])[::-1]
+        has_more = len(entries) > limit
+        entries = entries[1:] if has_more and since_id is None else entries[:limit]
+        if not entries and not Block.objects.filter(pk=block_id).exists():
+            return JsonResponse({'error': 'Block not found'}, status=404)
+        last_id = entries[-1]['id'] if entries else since_id
+        return JsonResponse({'entries': entries, 'last_id': last_id, 'has_more': has_more})
+    except ValueError:
+        return JsonResponse({'error': 'since_id and limit must be integers'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': f"An error occurred: {str(e)}"}, status=500)
+
+
+def get_dashboard_snapshot(request):
+    """
+    Retrieves the status and the new console output entries of many blocks in a single request.
+
+    Query parameters:
+    - ids: Comma-separated block IDs, all blocks if missing.
+    - since: Comma-separated block_id:log_entry_id pairs, the last entry the client already has for each block.
+      Blocks without a pair get their latest entries.
+    - limit: Maximum number of entries per block (default CONSOLE_TAIL_LIMIT, at most CONSOLE_TAIL_MAX_LIMIT).
+
+    Blocks are read with a single projected query and the entries of all blocks with a single windowed query.
+    The response carries an ETag, a request with a matching If-None-Match header gets an empty 304 response.
+
+    :param request: The HTTP request object.
+    :return: JSON response with, for each block, its status, the ID of its last log entry and its new entries (oldest first).
+    """
+    from .models import Block, LogEntry
+    try:
+        block_ids = [int(block_id) for block_id in request.GET.get('ids', '').split(',') if block_id.strip()]
+        since = {}
+        for pair in request.GET.get('since', '').split(','):
+            if pair.strip():
+                block_id, log_entry_id = pair.split(':')
+                since[int(block_id)] = int(log_entry_id)
+        limit = min(int(request.GET.get('limit', CONSOLE_TAIL_LIMIT)), CONSOLE_TAIL_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'ids, since and limit must be integers'}, status=400)
+
+    try:
+        blocks = Block.objects.only('id', 'status', 'is_running').order_by('id')
+        if block_ids:
+            blocks = blocks.filter(id__in=block_ids)
+        blocks = list(blocks)
+
+        # New entries of blocks with a cursor (oldest first), latest entries of the others (newest first)
+        entries_filter = Q(block_id__in=[block.id for block in blocks if block.id not in since])
+        for block_id, log_entry_id in since.items():
+            entries_filter |= Q(block_id=block_id, id__gt=log_entry_id)
+        entry_order = Case(When(block_id__in=list(since), then=F('id')), default=F('id') * -1)
+        log_entries = LogEntry.objects.filter(entries_filter).annotate(
+            row_number=Window(RowNumber(), partition_by=F('block_id'), order_by=entry_order)
+        ).filter(row_number__lte=limit).order_by('block_id', 'id').values('block_id', 'id', 'content')
+
+        entries_by_block = {}
+        for entry in log_entries:
+            entries_by_block.setdefault(entry['block_id'], []).append({'id': entry['id'], 'content': entry['content']})
+
+        snapshot = []
+        for block in blocks:
+            entries = entries_by_block.get(block.id, [])
+            snapshot.append({
+                'id': block.id,
+                'status': block.status,
+                'is_running': block.is_running,
+                'last_log_id': entries[-1]['id'] if entries else since.get(block.id),
+                'entries': entries,
+            })
+        content = json.dumps({'blocks': snapshot})
+    except Exception as e:
+        return JsonResponse({'error': f"An error occurred: {str(e)}"}, status=500)
+
+    etag = '"' + hashlib.md5(content.encode()).hexdigest() + '"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse({'blocks': snapshot})
+    response['ETag'] = etag
+    return response
+
+
 def get_block_status(request, block_id):
     """
     Retrieves the status of a specified block.
@@ -276,9 +461,23 @@ def get_block_status(request, block_id):
     """
     from .models import Block
     try:
-        block = Block.objects.get(pk=block_id)
-        return JsonResponse({'status': block.status})
+        state = get_block_state(block_id)
+        return JsonResponse({'status': state['status'], 'worker': get_supervisor().get_state(block_id)})
     except Block.DoesNotExist:
         return JsonResponse({'error': 'Block not found'}, status=404)
     except Exception as e:
         return JsonResponse({'error': f"An error occurred: {str(e)}"}, status=500)
+
+
+def get_supervisor_status(request):
+    """
+    Retrieves the state of every block supervised by this process and the counters of the PractiTest
+    request coalescer, rate limiter, retries and circuit breakers shared by its blocks.
+
+    :param request: The HTTP request object.
+    """
+    return JsonResponse({'blocks': get_supervisor().get_states(),
+                         'practitest_requests': get_shared_coalescer().stats(),
+                         'practitest_rate_limiter': get_shared_rate_limiter().stats(),
+                         'practitest_retries': get_retry_totals(),
+                         'circuit_breakers': get_breaker_states()})